@@ -1,15 +1,95 @@
-import json
+import base64
 import hashlib
+import hmac
+import json
 import os
-from typing import Dict, Any
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Tuple
 import psycopg2
 from psycopg2.extras import RealDictCursor
 
+CACHE_CHANNEL = 'cache_invalidate'
+
+SESSION_SECRET = os.environ.get('SESSION_SECRET', '')
+SESSION_TTL_SECONDS = int(os.environ.get('SESSION_TTL_SECONDS', str(30 * 24 * 3600)))
+
+SCRYPT_N = int(os.environ.get('SCRYPT_N', '16384'))
+SCRYPT_R = int(os.environ.get('SCRYPT_R', '8'))
+SCRYPT_P = int(os.environ.get('SCRYPT_P', '1'))
+HASH_WORKERS = int(os.environ.get('HASH_WORKERS', '2'))
+HASH_QUEUE_TIMEOUT_SECONDS = float(os.environ.get('HASH_QUEUE_TIMEOUT_SECONDS', '3'))
+
+_hash_pool = ThreadPoolExecutor(max_workers=HASH_WORKERS)
+_hash_slots = threading.BoundedSemaphore(HASH_WORKERS * 4)
+
+
+def _b64(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).rstrip(b'=').decode()
+
+
+def _unb64(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + '=' * (-len(text) % 4))
+
+
+def _scrypt_hash(password: str, salt: bytes, n: int, r: int, p: int) -> str:
+    digest = hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p, maxmem=256 * n * r + 1024 * 1024)
+    return f'scrypt${n}${r}${p}${_b64(salt)}${_b64(digest)}'
+
+
+def _hash_password(password: str) -> str:
+    return _scrypt_hash(password, os.urandom(16), SCRYPT_N, SCRYPT_R, SCRYPT_P)
+
+
+def _verify_password(password: str, stored: str) -> Tuple[bool, bool]:
+    '''Returns (matches, needs_rehash); unsalted sha256 hashes from before scrypt always need a rehash'''
+    if not stored.startswith('scrypt$'):
+        legacy = hashlib.sha256(password.encode()).hexdigest()
+        return hmac.compare_digest(legacy, stored), True
+    
+    _, n, r, p, salt, _digest = stored.split('$')
+    candidate = _scrypt_hash(password, _unb64(salt), int(n), int(r), int(p))
+    needs_rehash = (int(n), int(r), int(p)) != (SCRYPT_N, SCRYPT_R, SCRYPT_P)
+    return hmac.compare_digest(candidate, stored), needs_rehash
+
+
+# Verified against when the username is unknown, so a miss costs the same scrypt run as a wrong password
+_DUMMY_HASH = _hash_password(os.urandom(16).hex())
+
+
+def _run_hashing(fn, *args):
+    '''Run password hashing on the bounded pool; None when the queue is full so the caller can shed load'''
+    if not _hash_slots.acquire(timeout=HASH_QUEUE_TIMEOUT_SECONDS):
+        return None
+    try:
+        return _hash_pool.submit(fn, *args).result()
+    finally:
+        _hash_slots.release()
+
+
+def _issue_session_token(user_id: int) -> Tuple[str, int]:
+    '''HMAC-signed "<user_id>.<expires_at>.<signature>" token, verified by other handlers without a DB lookup'''
+    expires_at = int(time.time()) + SESSION_TTL_SECONDS
+    payload = f'{user_id}.{expires_at}'
+    signature = _b64(hmac.new(SESSION_SECRET.encode(), payload.encode(), hashlib.sha256).digest())
+    return f'{payload}.{signature}', expires_at
+
+
+def _busy_response() -> Dict[str, Any]:
+    return {
+        'statusCode': 503,
+        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*', 'Retry-After': '1'},
+        'body': json.dumps({'error': 'Too many login attempts, try again shortly'}),
+        'isBase64Encoded': False
+    }
+
+
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     '''
-    Business: User authentication and registration
+    Business: User authentication and registration, issuing signed session tokens
     Args: event with httpMethod, body (username, password, action: login|register)
-    Returns: HTTP response with user data or error
+    Returns: HTTP response with user data and session token or error
     '''
     method: str = event.get('httpMethod', 'POST')
     
@@ -47,15 +127,38 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             'isBase64Encoded': False
         }
     
-    password_hash = hashlib.sha256(password.encode()).hexdigest()
+    if not SESSION_SECRET:
+        return {
+            'statusCode': 500,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({'error': 'SESSION_SECRET is not configured'}),
+            'isBase64Encoded': False
+        }
     
     dsn = os.environ.get('DATABASE_URL')
-    conn = psycopg2.connect(dsn)
-    cur = conn.cursor(cursor_factory=RealDictCursor)
     
     if action == 'register':
-        cur.execute("SELECT id FROM users WHERE username = %s", (username,))
-        if cur.fetchone():
+        password_hash = _run_hashing(_hash_password, password)
+        if password_hash is None:
+            return _busy_response()
+        
+        conn = psycopg2.connect(dsn)
+        cur = conn.cursor(cursor_factory=RealDictCursor)
+        cur.execute("""
+            WITH new_user AS (
+                INSERT INTO users (username, password_hash) VALUES (%s, %s)
+                ON CONFLICT (username) DO NOTHING
+                RETURNING id, username
+            ), new_activity AS (
+                INSERT INTO user_activity (user_id, activity_count)
+                SELECT id, 0 FROM new_user
+            )
+            SELECT id, username FROM new_user
+        """, (username, password_hash))
+        user = cur.fetchone()
+        
+        if not user:
+            conn.rollback()
             cur.close()
             conn.close()
             return {
@@ -65,36 +168,29 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                 'isBase64Encoded': False
             }
         
-        cur.execute(
-            "INSERT INTO users (username, password_hash) VALUES (%s, %s) RETURNING id, username",
-            (username, password_hash)
-        )
-        user = cur.fetchone()
-        
-        cur.execute(
-            "INSERT INTO user_activity (user_id, activity_count) VALUES (%s, 0)",
-            (user['id'],)
-        )
+        cur.execute("SELECT pg_notify(%s, %s)", (CACHE_CHANNEL, 'leaderboard,users'))
         conn.commit()
         cur.close()
         conn.close()
-        
-        return {
-            'statusCode': 200,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'user_id': user['id'], 'username': user['username']}),
-            'isBase64Encoded': False
-        }
     else:
+        conn = psycopg2.connect(dsn)
+        cur = conn.cursor(cursor_factory=RealDictCursor)
         cur.execute(
-            "SELECT id, username FROM users WHERE username = %s AND password_hash = %s",
-            (username, password_hash)
+            "SELECT id, username, password_hash FROM users WHERE username = %s",
+            (username,)
         )
         user = cur.fetchone()
         cur.close()
         conn.close()
         
-        if not user:
+        verified = _run_hashing(_verify_password, password, user['password_hash'] if user else _DUMMY_HASH)
+        if verified is not None and not user:
+            verified = (False, False)
+        if verified is None:
+            return _busy_response()
+        
+        matches, needs_rehash = verified
+        if not matches:
             return {
                 'statusCode': 401,
                 'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
@@ -102,9 +198,29 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                 'isBase64Encoded': False
             }
         
-        return {
-            'statusCode': 200,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'user_id': user['id'], 'username': user['username']}),
-            'isBase64Encoded': False
-        }
+        if needs_rehash:
+            upgraded = _run_hashing(_hash_password, password)
+            if upgraded:
+                conn = psycopg2.connect(dsn)
+                cur = conn.cursor()
+                cur.execute(
+                    "UPDATE users SET password_hash = %s WHERE id = %s AND password_hash = %s",
+                    (upgraded, user['id'], user['password_hash'])
+                )
+                conn.commit()
+                cur.close()
+                conn.close()
+    
+    token, expires_at = _issue_session_token(user['id'])
+    
+    return {
+        'statusCode': 200,
+        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+        'body': json.dumps({
+            'user_id': user['id'],
+            'username': user['username'],
+            'token': token,
+            'expires_at': expires_at
+        }),
+        'isBase64Encoded': False
+    }
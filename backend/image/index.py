@@ -1,9 +1,151 @@
 import json
 import os
-from typing import Dict, Any
+import re
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Callable, Iterable, Tuple
 import psycopg2
+from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
 from psycopg2.extras import RealDictCursor
 
+CACHE_CHANNEL = 'cache_invalidate'
+CACHE_TTL_SECONDS = float(os.environ.get('CACHE_TTL_SECONDS', '300'))
+CACHE_MAX_ENTRIES = int(os.environ.get('CACHE_MAX_ENTRIES', '32'))
+
+_cache: 'OrderedDict[Tuple, Tuple[float, Any, frozenset, int]]' = OrderedDict()
+_cache_stats = {'hits': 0, 'misses': 0}
+_listener = None
+_drained_lsn = 0
+_invalidated_lsn = 0
+
+
+def _drain_invalidations(dsn: str, min_lsn: Optional[str] = None) -> None:
+    '''Apply pending NOTIFY invalidations; a lost listener means missed events, so flush everything.
+    A min_lsn past what was drained so far costs one round trip on the listener, after which every
+    invalidation committed up to the caller's own write has been delivered and applied'''
+    global _listener, _drained_lsn, _invalidated_lsn
+    try:
+        if _listener is None or _listener.closed:
+            _cache.clear()
+            _listener = psycopg2.connect(dsn)
+            _listener.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+            _listener.cursor().execute(f'LISTEN {CACHE_CHANNEL}')
+        _listener.poll()
+        if (_listener.notifies and REPLICA_DSNS) or _lsn_value(min_lsn) > _drained_lsn:
+            cur = _listener.cursor()
+            cur.execute('SELECT pg_current_wal_lsn()::text')
+            _drained_lsn = _lsn_value(cur.fetchone()[0])
+            cur.close()
+    except psycopg2.Error:
+        _listener = None
+        _cache.clear()
+        return
+    
+    tags = set()
+    while _listener.notifies:
+        tags.update(_listener.notifies.pop(0).payload.split(','))
+    if tags:
+        _invalidated_lsn = max(_invalidated_lsn, _drained_lsn)
+    if '*' in tags:
+        _cache.clear()
+    elif tags:
+        for key in [k for k, (_, _, t, _) in _cache.items() if t & tags]:
+            del _cache[key]
+
+
+def _read_lsn(min_lsn: Optional[str]) -> Optional[str]:
+    '''Position a read must reflect: the caller's own write, or the newest invalidation applied here, so a
+    reload after NOTIFY never caches a lagging replica's old rows again'''
+    floor = max(_lsn_value(min_lsn), _invalidated_lsn)
+    return f'{floor >> 32:X}/{floor & 0xFFFFFFFF:X}' if floor else None
+
+
+def _cached(key: Tuple, tags: Iterable[str], loader: Callable[[], Any], min_lsn: Optional[str] = None) -> Any:
+    '''Read-through TTL/LRU lookup; entries remember the LSN they were read at and are only reloaded for a
+    min_lsn that neither that LSN nor the drained invalidations cover'''
+    now = time.monotonic()
+    entry = _cache.get(key)
+    if entry and entry[0] > now and max(entry[3], _drained_lsn) >= _lsn_value(min_lsn):
+        _cache.move_to_end(key)
+        _cache_stats['hits'] += 1
+        return entry[1]
+    
+    _cache_stats['misses'] += 1
+    loaded_lsn = max(_lsn_value(min_lsn), _invalidated_lsn)
+    value = loader()
+    _cache[key] = (now + CACHE_TTL_SECONDS, value, frozenset(tags), loaded_lsn)
+    _cache.move_to_end(key)
+    while len(_cache) > CACHE_MAX_ENTRIES:
+        _cache.popitem(last=False)
+    return value
+
+
+def _cache_headers() -> Dict[str, str]:
+    total = _cache_stats['hits'] + _cache_stats['misses']
+    ratio = _cache_stats['hits'] / total if total else 0.0
+    return {
+        'X-Cache-Hits': str(_cache_stats['hits']),
+        'X-Cache-Misses': str(_cache_stats['misses']),
+        'X-Cache-Hit-Ratio': f'{ratio:.3f}'
+    }
+
+
+REPLICA_DSNS = [d.strip() for d in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if d.strip()]
+REPLICA_MAX_LAG_SECONDS = float(os.environ.get('REPLICA_MAX_LAG_SECONDS', '5'))
+REPLICA_CHECK_INTERVAL_SECONDS = float(os.environ.get('REPLICA_CHECK_INTERVAL_SECONDS', '10'))
+
+_replica_health: Dict[str, Tuple[float, bool]] = {}
+_replica_next = 0
+_LSN_PATTERN = re.compile(r'^[0-9A-F]{1,8}/[0-9A-F]{1,8}$', re.IGNORECASE)
+
+
+def _lsn_value(lsn: Optional[str]) -> int:
+    '''pg_lsn text "X/Y" as a comparable integer; request values are checked against _LSN_PATTERN first'''
+    if not lsn:
+        return 0
+    high, low = lsn.split('/')
+    return (int(high, 16) << 32) | int(low, 16)
+
+
+def _connect_read(dsn: str, min_lsn: Optional[str] = None):
+    '''Open a connection for read-only work: round-robin over caught-up replicas, primary as fallback'''
+    global _replica_next
+    now = time.monotonic()
+    for offset in range(len(REPLICA_DSNS)):
+        replica = REPLICA_DSNS[(_replica_next + offset) % len(REPLICA_DSNS)]
+        checked_at, healthy = _replica_health.get(replica, (0.0, False))
+        recently_checked = now - checked_at < REPLICA_CHECK_INTERVAL_SECONDS
+        if recently_checked and not healthy:
+            continue
+        try:
+            conn = psycopg2.connect(replica, connect_timeout=2)
+            if not recently_checked or min_lsn:
+                cur = conn.cursor()
+                cur.execute("""
+                    SELECT
+                        CASE WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+                             ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+                        END,
+                        %s::text IS NULL OR COALESCE(pg_last_wal_replay_lsn() >= %s::pg_lsn, FALSE)
+                """, (min_lsn, min_lsn))
+                lag, caught_up = cur.fetchone()
+                cur.close()
+                healthy = float(lag) <= REPLICA_MAX_LAG_SECONDS
+                _replica_health[replica] = (now, healthy)
+                if not (healthy and caught_up):
+                    conn.close()
+                    continue
+        except psycopg2.DataError:
+            conn.close()
+            break
+        except psycopg2.Error:
+            _replica_health[replica] = (now, False)
+            continue
+        _replica_next = (_replica_next + offset + 1) % len(REPLICA_DSNS)
+        return conn
+    return psycopg2.connect(dsn)
+
+
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     '''
     Business: Get single image by photo ID
@@ -35,6 +177,15 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     
     params = event.get('queryStringParameters', {})
     photo_id = params.get('photo_id')
+    min_lsn = params.get('min_lsn')
+    
+    if min_lsn and not _LSN_PATTERN.match(min_lsn):
+        return {
+            'statusCode': 400,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({'error': 'Invalid min_lsn'}),
+            'isBase64Encoded': False
+        }
     
     if not photo_id:
         return {
@@ -45,14 +196,18 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         }
     
     dsn = os.environ.get('DATABASE_URL')
-    conn = psycopg2.connect(dsn)
-    cur = conn.cursor(cursor_factory=RealDictCursor)
     
-    cur.execute("SELECT image_url FROM photos WHERE id = %s", (photo_id,))
-    result = cur.fetchone()
+    def load_image():
+        conn = _connect_read(dsn, _read_lsn(min_lsn))
+        cur = conn.cursor(cursor_factory=RealDictCursor)
+        cur.execute("SELECT image_url FROM photos WHERE id = %s", (photo_id,))
+        row = cur.fetchone()
+        cur.close()
+        conn.close()
+        return dict(row) if row else None
     
-    cur.close()
-    conn.close()
+    _drain_invalidations(dsn, min_lsn)
+    result = _cached(('image', str(photo_id)), {f'photo_content:{photo_id}'}, load_image, min_lsn=min_lsn)
     
     if not result:
         return {
@@ -64,7 +219,7 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     
     return {
         'statusCode': 200,
-        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*', **_cache_headers()},
         'body': json.dumps({'image_url': result['image_url']}),
         'isBase64Encoded': False
     }
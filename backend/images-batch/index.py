@@ -1,9 +1,66 @@
 import json
 import os
-from typing import Dict, Any
+import re
+import time
+from typing import Dict, Any, Optional, Tuple
 import psycopg2
 from psycopg2.extras import RealDictCursor
 
+REPLICA_DSNS = [d.strip() for d in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if d.strip()]
+REPLICA_MAX_LAG_SECONDS = float(os.environ.get('REPLICA_MAX_LAG_SECONDS', '5'))
+REPLICA_CHECK_INTERVAL_SECONDS = float(os.environ.get('REPLICA_CHECK_INTERVAL_SECONDS', '10'))
+
+_replica_health: Dict[str, Tuple[float, bool]] = {}
+_replica_next = 0
+_LSN_PATTERN = re.compile(r'^[0-9A-F]{1,8}/[0-9A-F]{1,8}$', re.IGNORECASE)
+
+
+def _lsn_value(lsn: Optional[str]) -> int:
+    '''pg_lsn text "X/Y" as a comparable integer; request values are checked against _LSN_PATTERN first'''
+    if not lsn:
+        return 0
+    high, low = lsn.split('/')
+    return (int(high, 16) << 32) | int(low, 16)
+
+def _connect_read(dsn: str, min_lsn: Optional[str] = None):
+    '''Open a connection for read-only work: round-robin over caught-up replicas, primary as fallback'''
+    global _replica_next
+    now = time.monotonic()
+    for offset in range(len(REPLICA_DSNS)):
+        replica = REPLICA_DSNS[(_replica_next + offset) % len(REPLICA_DSNS)]
+        checked_at, healthy = _replica_health.get(replica, (0.0, False))
+        recently_checked = now - checked_at < REPLICA_CHECK_INTERVAL_SECONDS
+        if recently_checked and not healthy:
+            continue
+        try:
+            conn = psycopg2.connect(replica, connect_timeout=2)
+            if not recently_checked or min_lsn:
+                cur = conn.cursor()
+                cur.execute("""
+                    SELECT
+                        CASE WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+                             ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+                        END,
+                        %s::text IS NULL OR COALESCE(pg_last_wal_replay_lsn() >= %s::pg_lsn, FALSE)
+                """, (min_lsn, min_lsn))
+                lag, caught_up = cur.fetchone()
+                cur.close()
+                healthy = float(lag) <= REPLICA_MAX_LAG_SECONDS
+                _replica_health[replica] = (now, healthy)
+                if not (healthy and caught_up):
+                    conn.close()
+                    continue
+        except psycopg2.DataError:
+            conn.close()
+            break
+        except psycopg2.Error:
+            _replica_health[replica] = (now, False)
+            continue
+        _replica_next = (_replica_next + offset + 1) % len(REPLICA_DSNS)
+        return conn
+    return psycopg2.connect(dsn)
+
+
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     '''
     Business: Batch load multiple images by IDs (up to 10 at once)
@@ -35,6 +92,15 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     
     params = event.get('queryStringParameters', {})
     photo_ids_str = params.get('photo_ids', '')
+    min_lsn = params.get('min_lsn')
+    
+    if min_lsn and not _LSN_PATTERN.match(min_lsn):
+        return {
+            'statusCode': 400,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({'error': 'Invalid min_lsn'}),
+            'isBase64Encoded': False
+        }
     
     if not photo_ids_str:
         return {
@@ -71,7 +137,7 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         }
     
     dsn = os.environ.get('DATABASE_URL')
-    conn = psycopg2.connect(dsn)
+    conn = _connect_read(dsn, min_lsn)
     cur = conn.cursor(cursor_factory=RealDictCursor)
     
     placeholders = ','.join(['%s'] * len(photo_ids))
@@ -1,14 +1,283 @@
+import base64
+import hashlib
+import io
 import json
+import math
 import os
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timezone, timedelta
-from typing import Dict, Any
+from typing import Dict, Any, List, Tuple
 import psycopg2
-from psycopg2.extras import RealDictCursor
+from psycopg2 import sql
+from psycopg2.extras import RealDictCursor, execute_values
+from PIL import Image
+
+CACHE_CHANNEL = 'cache_invalidate'
+MATCHUP_ROUNDS = int(os.environ.get('MATCHUP_ROUNDS', '3'))
+RECONCILE_WORKERS = int(os.environ.get('RECONCILE_WORKERS', str(os.cpu_count() or 2)))
+RECONCILE_BATCH_SIZE = int(os.environ.get('RECONCILE_BATCH_SIZE', '5000'))
+RECONCILE_FETCH_SIZE = 50000
+RECONCILE_REPORT_SAMPLE = 20
+PHASH_MAX_DISTANCE = int(os.environ.get('PHASH_MAX_DISTANCE', '6'))
+HASH_SCAN_CHUNK = 200
+BLURHASH_COMPONENTS = (4, 3)
+SEASON_PARTITIONED_TABLES = ('photos', 'votes', 'shown_photos')
+_HASH_MASK = (1 << 64) - 1
+
+
+def _replay_category_votes(dsn: str, snapshot_id: str, category_id: int) -> Dict[str, Any]:
+    '''Recount one category's photo counters and per-user activity from votes, inside the shared snapshot'''
+    conn = psycopg2.connect(dsn)
+    conn.set_session(isolation_level='REPEATABLE READ', readonly=True)
+    cur = conn.cursor()
+    cur.execute("SET TRANSACTION SNAPSHOT %s", (snapshot_id,))
+    cur.execute("SELECT id, rating, views_count FROM photos WHERE category_id = %s", (category_id,))
+    stored = {photo_id: (rating or 0, views or 0) for photo_id, rating, views in cur.fetchall()}
+    cur.close()
+    if not stored:
+        conn.rollback()
+        conn.close()
+        return {'category_id': category_id, 'votes_replayed': 0, 'photo_deltas': [], 'activity': {}}
+    
+    ratings: Counter = Counter()
+    views: Counter = Counter()
+    activity: Counter = Counter()
+    replayed = 0
+    
+    stream = conn.cursor(name=f'reconcile_votes_{category_id}')
+    stream.itersize = RECONCILE_FETCH_SIZE
+    stream.execute("""
+        SELECT v.photo1_id, v.photo2_id, v.winner_photo_id, v.user_id,
+               COALESCE(v.voted_at >= ua.last_reset_at, FALSE) AS counts_for_activity
+        FROM votes v
+        LEFT JOIN user_activity ua ON ua.user_id = v.user_id
+        WHERE v.winner_photo_id = ANY(%s)
+    """, (list(stored),))
+    for photo1_id, photo2_id, winner_photo_id, user_id, counts_for_activity in stream:
+        ratings[winner_photo_id] += 1
+        views[photo1_id] += 1
+        views[photo2_id] += 1
+        if counts_for_activity:
+            activity[user_id] += 1
+        replayed += 1
+    stream.close()
+    conn.rollback()
+    conn.close()
+    
+    photo_deltas = []
+    for photo_id, (rating, views_count) in stored.items():
+        rating_delta = ratings[photo_id] - rating
+        views_delta = views[photo_id] - views_count
+        if rating_delta or views_delta:
+            photo_deltas.append((photo_id, rating_delta, views_delta))
+    
+    return {
+        'category_id': category_id,
+        'votes_replayed': replayed,
+        'photo_deltas': photo_deltas,
+        'activity': dict(activity)
+    }
+
+
+def _hamming(a: int, b: int) -> int:
+    return ((a ^ b) & _HASH_MASK).bit_count()
+
+
+MAX_IMAGE_PIXELS = int(os.environ.get('MAX_IMAGE_PIXELS', str(4096 * 4096)))
+
+
+def _open_image(image_bytes: bytes) -> Image.Image:
+    '''Read only the header and refuse oversized images before any pixels are decoded'''
+    image = Image.open(io.BytesIO(image_bytes))
+    width, height = image.size
+    if width * height > MAX_IMAGE_PIXELS:
+        raise ValueError(f'Image is {width}x{height}, over the {MAX_IMAGE_PIXELS} pixel limit')
+    return image
+
+
+def _image_hashes(data_url: str) -> Tuple[str, int]:
+    '''Same SHA-256 + signed 64-bit dHash as photos POST computes on upload'''
+    image_bytes = base64.b64decode(data_url.split(',', 1)[-1])
+    content_hash = hashlib.sha256(image_bytes).hexdigest()
+    
+    pixels = list(_open_image(image_bytes).convert('L').resize((9, 8), Image.LANCZOS).getdata())
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            bits = (bits << 1) | int(pixels[row * 9 + col] > pixels[row * 9 + col + 1])
+    return content_hash, bits - (1 << 64) if bits >= (1 << 63) else bits
+
+
+def _hash_photo_chunk(dsn: str, photo_ids: List[int]) -> List[Tuple[int, str, int]]:
+    '''Worker: hash a chunk of stored photos; undecodable images are skipped'''
+    conn = psycopg2.connect(dsn)
+    cur = conn.cursor()
+    cur.execute("SELECT id, image_url FROM photos WHERE id = ANY(%s)", (photo_ids,))
+    hashed = []
+    for photo_id, image_url in cur.fetchall():
+        try:
+            hashed.append((photo_id, *_image_hashes(image_url)))
+        except (ValueError, OSError, Image.DecompressionBombError):
+            continue
+    cur.close()
+    conn.close()
+    return hashed
+
+
+_BASE83 = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz#$%*+,-.:;=?@[]^_{|}~'
+
+
+def _base83(value: int, length: int) -> str:
+    return ''.join(_BASE83[(value // 83 ** (length - i - 1)) % 83] for i in range(length))
+
+
+def _srgb_to_linear(value: int) -> float:
+    v = value / 255
+    return v / 12.92 if v <= 0.04045 else ((v + 0.055) / 1.055) ** 2.4
+
+
+def _linear_to_srgb(value: float) -> int:
+    v = max(0.0, min(1.0, value))
+    return int(v * 12.92 * 255 + 0.5) if v <= 0.0031308 else int((1.055 * v ** (1 / 2.4) - 0.055) * 255 + 0.5)
+
+
+def _blurhash(data_url: str) -> str:
+    '''~28-character blurhash of the image, small enough to inline in list responses'''
+    image = _open_image(base64.b64decode(data_url.split(',', 1)[-1])).convert('RGB')
+    image.thumbnail((32, 32))
+    width, height = image.size
+    pixels = [tuple(_srgb_to_linear(c) for c in px) for px in image.getdata()]
+    x_components, y_components = BLURHASH_COMPONENTS
+    
+    factors = []
+    for j in range(y_components):
+        cos_y = [math.cos(math.pi * j * y / height) for y in range(height)]
+        for i in range(x_components):
+            cos_x = [math.cos(math.pi * i * x / width) for x in range(width)]
+            norm = (1 if i == 0 and j == 0 else 2) / (width * height)
+            r = g = b = 0.0
+            for y in range(height):
+                for x in range(width):
+                    basis = cos_x[x] * cos_y[y]
+                    pr, pg, pb = pixels[y * width + x]
+                    r += basis * pr
+                    g += basis * pg
+                    b += basis * pb
+            factors.append((r * norm, g * norm, b * norm))
+    
+    dc, ac = factors[0], factors[1:]
+    quantised_max = max(0, min(82, int(max(abs(c) for f in ac for c in f) * 166 - 0.5)))
+    max_value = (quantised_max + 1) / 166
+    
+    encoded = _base83((x_components - 1) + (y_components - 1) * 9, 1) + _base83(quantised_max, 1)
+    encoded += _base83((_linear_to_srgb(dc[0]) << 16) + (_linear_to_srgb(dc[1]) << 8) + _linear_to_srgb(dc[2]), 4)
+    for f in ac:
+        q = [max(0, min(18, int(math.floor(math.copysign(abs(c / max_value) ** 0.5, c) * 9 + 9.5)))) for c in f]
+        encoded += _base83(q[0] * 19 * 19 + q[1] * 19 + q[2], 2)
+    return encoded
+
+
+def _placeholder_chunk(dsn: str, photo_ids: List[int]) -> List[Tuple[int, str]]:
+    '''Worker: blurhash placeholders for a chunk of stored photos, preferring the small thumbnail'''
+    conn = psycopg2.connect(dsn)
+    cur = conn.cursor()
+    cur.execute("SELECT id, COALESCE(NULLIF(thumbnail_url, ''), image_url) FROM photos WHERE id = ANY(%s)", (photo_ids,))
+    encoded = []
+    for photo_id, data_url in cur.fetchall():
+        try:
+            encoded.append((photo_id, _blurhash(data_url)))
+        except (ValueError, OSError, Image.DecompressionBombError):
+            continue
+    cur.close()
+    conn.close()
+    return encoded
+
+
+class _BKTree:
+    '''Burkhard-Keller tree keyed by Hamming distance, used to cluster near-duplicates'''
+    
+    def __init__(self):
+        self.root = None
+    
+    def add(self, phash: int, photo_id: int) -> None:
+        if self.root is None:
+            self.root = (phash, [photo_id], {})
+            return
+        node = self.root
+        while True:
+            distance = _hamming(phash, node[0])
+            if distance == 0:
+                node[1].append(photo_id)
+                return
+            if distance not in node[2]:
+                node[2][distance] = (phash, [photo_id], {})
+                return
+            node = node[2][distance]
+    
+    def search(self, phash: int, radius: int) -> List[Tuple[int, int]]:
+        matches = []
+        stack = [self.root] if self.root else []
+        while stack:
+            node = stack.pop()
+            distance = _hamming(phash, node[0])
+            if distance <= radius:
+                matches.extend((photo_id, distance) for photo_id in node[1])
+            stack.extend(child for edge, child in node[2].items() if distance - radius <= edge <= distance + radius)
+        return matches
+
+
+def _refresh_rollups(cur, today) -> None:
+    '''Rank today's snapshot and fold it into the weekly and monthly buckets that contain today'''
+    for entity_type, id_column, value_column, filter_sql in (
+        ('user', 'user_id', 'activity_count', 'photo_id IS NULL'),
+        ('photo', 'photo_id', 'photo_rating', 'photo_id IS NOT NULL'),
+    ):
+        cur.execute(f"""
+            INSERT INTO stats_rollups (entity_type, bucket_days, entity_id, bucket_start, value_last, value_max, rank_last, rank_best)
+            SELECT %s, 1, entity_id, %s, value, value, rnk, rnk
+            FROM (
+                SELECT {id_column} AS entity_id, MAX(COALESCE({value_column}, 0)) AS value,
+                       RANK() OVER (ORDER BY MAX(COALESCE({value_column}, 0)) DESC) AS rnk
+                FROM daily_stats
+                WHERE snapshot_date = %s AND {filter_sql}
+                GROUP BY {id_column}
+            ) ranked
+            ON CONFLICT (entity_type, bucket_days, entity_id, bucket_start) DO UPDATE SET
+                value_last = EXCLUDED.value_last, value_max = EXCLUDED.value_max,
+                rank_last = EXCLUDED.rank_last, rank_best = EXCLUDED.rank_best
+        """, (entity_type, today, today))
+    
+    for bucket_days, bucket_start in ((7, today - timedelta(days=today.weekday())), (30, today.replace(day=1))):
+        cur.execute("""
+            INSERT INTO stats_rollups (entity_type, bucket_days, entity_id, bucket_start, value_last, value_max, rank_last, rank_best)
+            SELECT entity_type, %s, entity_id, %s,
+                   (ARRAY_AGG(value_last ORDER BY bucket_start DESC))[1], MAX(value_max),
+                   (ARRAY_AGG(rank_last ORDER BY bucket_start DESC))[1], MIN(rank_best)
+            FROM stats_rollups
+            WHERE bucket_days = 1 AND bucket_start BETWEEN %s AND %s
+            GROUP BY entity_type, entity_id
+            ON CONFLICT (entity_type, bucket_days, entity_id, bucket_start) DO UPDATE SET
+                value_last = EXCLUDED.value_last, value_max = EXCLUDED.value_max,
+                rank_last = EXCLUDED.rank_last, rank_best = EXCLUDED.rank_best
+        """, (bucket_days, bucket_start, bucket_start, today))
+
+
+def _apply_in_batches(conn, query: str, rows: List[tuple]) -> None:
+    '''Apply corrections in short transactions so live voting only waits on one batch of row locks'''
+    cur = conn.cursor()
+    for start in range(0, len(rows), RECONCILE_BATCH_SIZE):
+        execute_values(cur, query, rows[start:start + RECONCILE_BATCH_SIZE], page_size=RECONCILE_BATCH_SIZE)
+        conn.commit()
+    cur.close()
+
 
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     '''
-    Business: Reset monthly activity and update daily statistics snapshots
-    Args: event with httpMethod, query params (action: reset_activity|update_stats)
+    Business: Reset activity, snapshot daily stats, backfill stats rollups, schedule matchups, reconcile counters,
+              scan for duplicates, backfill placeholders, start and archive contest seasons
+    Args: event with httpMethod, query params (action: reset_activity|update_stats|backfill_rollups|schedule_matchups|
+          reconcile|scan_duplicates|backfill_placeholders|start_season|archive_season, dry_run, flag, name, season_id)
     Returns: HTTP response with operation result
     '''
     method: str = event.get('httpMethod', 'POST')
@@ -57,9 +326,10 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         if users_to_reset > 0:
             cur.execute("""
                 UPDATE user_activity 
-                SET activity_count = 0, last_reset_date = %s
+                SET activity_count = 0, last_reset_date = %s, last_reset_at = now()
                 WHERE last_reset_date < %s
             """, (today, today))
+            cur.execute("SELECT pg_notify(%s, %s)", (CACHE_CHANNEL, 'leaderboard'))
             
             conn.commit()
             message = f'Activity reset for {users_to_reset} users'
@@ -111,6 +381,8 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                 DO UPDATE SET photo_rating = EXCLUDED.photo_rating
             """, (today, photo['user_id'], photo['photo_id'], photo['rating']))
         
+        _refresh_rollups(cur, today)
+        cur.execute("SELECT pg_notify(%s, %s)", (CACHE_CHANNEL, 'trends'))
         conn.commit()
         cur.close()
         conn.close()
@@ -128,6 +400,370 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             'isBase64Encoded': False
         }
     
+    elif action == 'backfill_rollups':
+        # One-off: replay every stored snapshot in date order so weekly and monthly buckets fold in their days.
+        # Each date commits on its own, so a long history never holds one huge transaction.
+        cur.execute("SELECT DISTINCT snapshot_date FROM daily_stats ORDER BY snapshot_date")
+        snapshot_dates = [row['snapshot_date'] for row in cur.fetchall()]
+        
+        for snapshot_date in snapshot_dates:
+            _refresh_rollups(cur, snapshot_date)
+            conn.commit()
+        if snapshot_dates:
+            cur.execute("SELECT pg_notify(%s, %s)", (CACHE_CHANNEL, 'trends'))
+            conn.commit()
+        
+        cur.close()
+        conn.close()
+        
+        return {
+            'statusCode': 200,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({
+                'action': 'backfill_rollups',
+                'date': str(today),
+                'snapshots_replayed': len(snapshot_dates),
+                'first_snapshot': str(snapshot_dates[0]) if snapshot_dates else None,
+                'last_snapshot': str(snapshot_dates[-1]) if snapshot_dates else None,
+                'message': 'Stats rollups backfilled'
+            }),
+            'isBase64Encoded': False
+        }
+    
+    elif action == 'schedule_matchups':
+        rounds = int(params.get('rounds', MATCHUP_ROUNDS))
+        
+        cur.execute("SELECT id, name FROM categories ORDER BY display_order")
+        categories = cur.fetchall()
+        
+        summary = []
+        for category in categories:
+            cur.execute("""
+                SELECT id, rating, views_count
+                FROM photos
+                WHERE season_id = (SELECT id FROM seasons WHERE is_active)
+                AND category_id = %s
+                ORDER BY rating DESC, views_count ASC, id
+            """, (category['id'],))
+            standings = cur.fetchall()
+            
+            # Swiss pairing: each photo meets its next `rounds` neighbours in the standings.
+            # Small rating gaps first, then rarely seen pairs, which tell us the most per vote.
+            desired = {}
+            for offset in range(1, rounds + 1):
+                for left, right in zip(standings, standings[offset:]):
+                    pair = (min(left['id'], right['id']), max(left['id'], right['id']))
+                    gap = abs(left['rating'] - right['rating'])
+                    desired[pair] = gap * 1000 + min(left['views_count'] + right['views_count'], 999)
+            
+            cur.execute("""
+                SELECT photo1_id, photo2_id, priority FROM matchup_queue WHERE category_id = %s
+            """, (category['id'],))
+            existing = {(row['photo1_id'], row['photo2_id']): row['priority'] for row in cur.fetchall()}
+            
+            stale = [(category['id'], a, b) for (a, b) in existing if (a, b) not in desired]
+            added = [(category['id'], a, b, p) for (a, b), p in desired.items() if (a, b) not in existing]
+            moved = [(category['id'], a, b, p) for (a, b), p in desired.items() if (a, b) in existing and existing[(a, b)] != p]
+            
+            if stale:
+                execute_values(cur, """
+                    DELETE FROM matchup_queue q
+                    USING (VALUES %s) AS s(category_id, photo1_id, photo2_id)
+                    WHERE q.category_id = s.category_id
+                    AND q.photo1_id = s.photo1_id AND q.photo2_id = s.photo2_id
+                """, stale)
+            if added:
+                execute_values(cur, """
+                    INSERT INTO matchup_queue (category_id, photo1_id, photo2_id, priority)
+                    VALUES %s
+                    ON CONFLICT (category_id, photo1_id, photo2_id) DO NOTHING
+                """, added)
+            if moved:
+                execute_values(cur, """
+                    UPDATE matchup_queue q SET priority = s.priority
+                    FROM (VALUES %s) AS s(category_id, photo1_id, photo2_id, priority)
+                    WHERE q.category_id = s.category_id
+                    AND q.photo1_id = s.photo1_id AND q.photo2_id = s.photo2_id
+                """, moved)
+            
+            conn.commit()
+            summary.append({
+                'category': category['name'],
+                'scheduled': len(desired),
+                'added': len(added),
+                'removed': len(stale),
+                'reprioritized': len(moved)
+            })
+        
+        cur.close()
+        conn.close()
+        
+        return {
+            'statusCode': 200,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({
+                'action': 'schedule_matchups',
+                'date': str(today),
+                'rounds': rounds,
+                'categories': summary,
+                'message': 'Matchup schedules updated'
+            }),
+            'isBase64Encoded': False
+        }
+    
+    elif action == 'reconcile':
+        dry_run = params.get('dry_run', '').lower() in ('1', 'true', 'yes')
+        
+        # Workers import this snapshot, so stored counters and replayed votes are read at the same instant.
+        # Corrections are applied as deltas, which keeps increments from votes cast meanwhile intact.
+        conn.set_session(isolation_level='REPEATABLE READ', readonly=True)
+        cur.execute("SELECT pg_export_snapshot() AS snapshot_id")
+        snapshot_id = cur.fetchone()['snapshot_id']
+        
+        # Users without an exact reset instant (rows from before last_reset_at existed) are left alone
+        cur.execute("SELECT user_id, activity_count FROM user_activity WHERE last_reset_at IS NOT NULL")
+        stored_activity = {row['user_id']: row['activity_count'] or 0 for row in cur.fetchall()}
+        cur.execute("SELECT id FROM categories ORDER BY display_order")
+        category_ids = [row['id'] for row in cur.fetchall()]
+        
+        with ProcessPoolExecutor(max_workers=max(1, min(RECONCILE_WORKERS, len(category_ids)))) as pool:
+            replays = list(pool.map(
+                _replay_category_votes,
+                [dsn] * len(category_ids),
+                [snapshot_id] * len(category_ids),
+                category_ids
+            ))
+        
+        conn.rollback()
+        conn.set_session(isolation_level='READ COMMITTED', readonly=False)
+        
+        photo_deltas = [delta for replay in replays for delta in replay['photo_deltas']]
+        replayed_activity: Counter = Counter()
+        for replay in replays:
+            replayed_activity.update(replay['activity'])
+        activity_deltas = [
+            (user_id, replayed_activity[user_id] - stored)
+            for user_id, stored in stored_activity.items()
+            if replayed_activity[user_id] != stored
+        ]
+        
+        if not dry_run:
+            _apply_in_batches(conn, """
+                UPDATE photos p
+                SET rating = p.rating + d.rating_delta, views_count = p.views_count + d.views_delta
+                FROM (VALUES %s) AS d(photo_id, rating_delta, views_delta)
+                WHERE p.id = d.photo_id
+            """, photo_deltas)
+            _apply_in_batches(conn, """
+                UPDATE user_activity ua
+                SET activity_count = ua.activity_count + d.activity_delta
+                FROM (VALUES %s) AS d(user_id, activity_delta)
+                WHERE ua.user_id = d.user_id
+            """, activity_deltas)
+            if photo_deltas or activity_deltas:
+                cur.execute("SELECT pg_notify(%s, %s)", (CACHE_CHANNEL, '*'))
+                conn.commit()
+        
+        cur.close()
+        conn.close()
+        
+        return {
+            'statusCode': 200,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({
+                'action': 'reconcile',
+                'date': str(today),
+                'dry_run': dry_run,
+                'votes_replayed': sum(replay['votes_replayed'] for replay in replays),
+                'photos_corrected': len(photo_deltas),
+                'users_corrected': len(activity_deltas),
+                'photo_sample': [
+                    {'photo_id': p, 'rating_delta': r, 'views_delta': v}
+                    for p, r, v in photo_deltas[:RECONCILE_REPORT_SAMPLE]
+                ],
+                'activity_sample': [
+                    {'user_id': u, 'activity_delta': a}
+                    for u, a in activity_deltas[:RECONCILE_REPORT_SAMPLE]
+                ],
+                'message': 'Dry run, no changes applied' if dry_run else 'Counters reconciled'
+            }),
+            'isBase64Encoded': False
+        }
+    
+    elif action == 'scan_duplicates':
+        flag = params.get('flag', '').lower() in ('1', 'true', 'yes')
+        
+        cur.execute("SELECT id FROM photos WHERE phash IS NULL ORDER BY id")
+        missing = [row['id'] for row in cur.fetchall()]
+        chunks = [missing[i:i + HASH_SCAN_CHUNK] for i in range(0, len(missing), HASH_SCAN_CHUNK)]
+        
+        hashed = []
+        if chunks:
+            with ProcessPoolExecutor(max_workers=max(1, min(RECONCILE_WORKERS, len(chunks)))) as pool:
+                for result in pool.map(_hash_photo_chunk, [dsn] * len(chunks), chunks):
+                    hashed.extend(result)
+            _apply_in_batches(conn, """
+                UPDATE photos p SET content_hash = h.content_hash, phash = h.phash
+                FROM (VALUES %s) AS h(photo_id, content_hash, phash)
+                WHERE p.id = h.photo_id
+            """, hashed)
+        
+        # Oldest upload wins: each photo is matched only against photos uploaded before it.
+        cur.execute("SELECT id, phash FROM photos WHERE phash IS NOT NULL ORDER BY id")
+        tree = _BKTree()
+        duplicates = []
+        for row in cur.fetchall():
+            matches = tree.search(row['phash'], PHASH_MAX_DISTANCE)
+            if matches:
+                original_id, distance = min(matches, key=lambda match: (match[1], match[0]))
+                duplicates.append((row['id'], original_id, distance))
+            tree.add(row['phash'], row['id'])
+        
+        if flag and duplicates:
+            _apply_in_batches(conn, """
+                UPDATE photos p SET duplicate_of = d.original_id
+                FROM (VALUES %s) AS d(photo_id, original_id)
+                WHERE p.id = d.photo_id AND p.duplicate_of IS NULL
+            """, [(photo_id, original_id) for photo_id, original_id, _ in duplicates])
+        conn.commit()
+        
+        cur.close()
+        conn.close()
+        
+        return {
+            'statusCode': 200,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({
+                'action': 'scan_duplicates',
+                'date': str(today),
+                'photos_hashed': len(hashed),
+                'undecodable': len(missing) - len(hashed),
+                'duplicates_found': len(duplicates),
+                'flagged': flag,
+                'sample': [
+                    {'photo_id': p, 'duplicate_of': o, 'distance': d}
+                    for p, o, d in duplicates[:RECONCILE_REPORT_SAMPLE]
+                ],
+                'message': 'Duplicate scan completed'
+            }),
+            'isBase64Encoded': False
+        }
+    
+    elif action == 'backfill_placeholders':
+        cur.execute("SELECT id FROM photos WHERE placeholder IS NULL ORDER BY id")
+        missing = [row['id'] for row in cur.fetchall()]
+        chunks = [missing[i:i + HASH_SCAN_CHUNK] for i in range(0, len(missing), HASH_SCAN_CHUNK)]
+        
+        encoded = []
+        if chunks:
+            with ProcessPoolExecutor(max_workers=max(1, min(RECONCILE_WORKERS, len(chunks)))) as pool:
+                for result in pool.map(_placeholder_chunk, [dsn] * len(chunks), chunks):
+                    encoded.extend(result)
+            _apply_in_batches(conn, """
+                UPDATE photos p SET placeholder = e.placeholder
+                FROM (VALUES %s) AS e(photo_id, placeholder)
+                WHERE p.id = e.photo_id
+            """, encoded)
+            cur.execute("SELECT pg_notify(%s, %s)", (CACHE_CHANNEL, '*'))
+            conn.commit()
+        
+        cur.close()
+        conn.close()
+        
+        return {
+            'statusCode': 200,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({
+                'action': 'backfill_placeholders',
+                'date': str(today),
+                'photos_updated': len(encoded),
+                'undecodable': len(missing) - len(encoded),
+                'message': 'Placeholders backfilled'
+            }),
+            'isBase64Encoded': False
+        }
+    
+    elif action == 'start_season':
+        name = params.get('name') or f'Сезон {today}'
+        
+        cur.execute("UPDATE seasons SET is_active = FALSE, ended_at = CURRENT_TIMESTAMP WHERE is_active")
+        cur.execute("INSERT INTO seasons (name, is_active) VALUES (%s, TRUE) RETURNING id", (name,))
+        season_id = cur.fetchone()['id']
+        
+        for table in SEASON_PARTITIONED_TABLES:
+            cur.execute(sql.SQL("CREATE TABLE IF NOT EXISTS {} PARTITION OF {} FOR VALUES IN ({})").format(
+                sql.Identifier(f'{table}_s{season_id}'), sql.Identifier(table), sql.Literal(season_id)
+            ))
+        
+        cur.execute("DELETE FROM matchup_queue")
+        cur.execute("SELECT pg_notify(%s, %s)", (CACHE_CHANNEL, '*'))
+        conn.commit()
+        cur.close()
+        conn.close()
+        
+        return {
+            'statusCode': 200,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({
+                'action': 'start_season',
+                'date': str(today),
+                'season_id': season_id,
+                'name': name,
+                'message': 'New season started'
+            }),
+            'isBase64Encoded': False
+        }
+    
+    elif action == 'archive_season':
+        season_id = params.get('season_id')
+        season = None
+        if season_id:
+            cur.execute("SELECT id, is_active, archived_at FROM seasons WHERE id = %s", (season_id,))
+            season = cur.fetchone()
+        
+        error = None
+        if not season:
+            error = 'Season not found'
+        elif season['is_active']:
+            error = 'Cannot archive the active season'
+        elif season['archived_at']:
+            error = 'Season already archived'
+        
+        if error:
+            cur.close()
+            conn.close()
+            return {
+                'statusCode': 400,
+                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                'body': json.dumps({'error': error}),
+                'isBase64Encoded': False
+            }
+        
+        # Detached partitions stay in place as standalone <table>_s<id> tables for export or DROP.
+        for table in SEASON_PARTITIONED_TABLES:
+            cur.execute(sql.SQL("ALTER TABLE {} DETACH PARTITION {}").format(
+                sql.Identifier(table), sql.Identifier(f'{table}_s{season["id"]}')
+            ))
+        
+        cur.execute("UPDATE seasons SET archived_at = CURRENT_TIMESTAMP WHERE id = %s", (season['id'],))
+        cur.execute("SELECT pg_notify(%s, %s)", (CACHE_CHANNEL, '*'))
+        conn.commit()
+        cur.close()
+        conn.close()
+        
+        return {
+            'statusCode': 200,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({
+                'action': 'archive_season',
+                'date': str(today),
+                'season_id': season['id'],
+                'detached': [f'{table}_s{season["id"]}' for table in SEASON_PARTITIONED_TABLES],
+                'message': 'Season archived'
+            }),
+            'isBase64Encoded': False
+        }
+    
     cur.close()
     conn.close()
     
@@ -1,9 +1,471 @@
+import base64
+import hashlib
+import hmac
+import io
 import json
+import math
 import os
-from typing import Dict, Any
+import random
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Callable, Iterable, List, Tuple
 import psycopg2
+from PIL import Image
+from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
 from psycopg2.extras import RealDictCursor
 
+CACHE_CHANNEL = 'cache_invalidate'
+CACHE_TTL_SECONDS = float(os.environ.get('CACHE_TTL_SECONDS', '300'))
+CACHE_MAX_ENTRIES = int(os.environ.get('CACHE_MAX_ENTRIES', '256'))
+
+_cache: 'OrderedDict[Tuple, Tuple[float, Any, frozenset, int]]' = OrderedDict()
+_cache_stats = {'hits': 0, 'misses': 0}
+_listener = None
+_drained_lsn = 0
+_invalidated_lsn = 0
+
+
+def _drain_invalidations(dsn: str, min_lsn: Optional[str] = None) -> None:
+    '''Apply pending NOTIFY invalidations; a lost listener means missed events, so flush everything.
+    A min_lsn past what was drained so far costs one round trip on the listener, after which every
+    invalidation committed up to the caller's own write has been delivered and applied'''
+    global _listener, _drained_lsn, _invalidated_lsn
+    try:
+        if _listener is None or _listener.closed:
+            _cache.clear()
+            _listener = psycopg2.connect(dsn)
+            _listener.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+            _listener.cursor().execute(f'LISTEN {CACHE_CHANNEL}')
+        _listener.poll()
+        if (_listener.notifies and REPLICA_DSNS) or _lsn_value(min_lsn) > _drained_lsn:
+            cur = _listener.cursor()
+            cur.execute('SELECT pg_current_wal_lsn()::text')
+            _drained_lsn = _lsn_value(cur.fetchone()[0])
+            cur.close()
+    except psycopg2.Error:
+        _listener = None
+        _cache.clear()
+        return
+    
+    tags = set()
+    while _listener.notifies:
+        tags.update(_listener.notifies.pop(0).payload.split(','))
+    if tags:
+        _invalidated_lsn = max(_invalidated_lsn, _drained_lsn)
+    if '*' in tags:
+        _cache.clear()
+    elif tags:
+        for key in [k for k, (_, _, t, _) in _cache.items() if t & tags]:
+            del _cache[key]
+
+
+def _read_lsn(min_lsn: Optional[str]) -> Optional[str]:
+    '''Position a read must reflect: the caller's own write, or the newest invalidation applied here, so a
+    reload after NOTIFY never caches a lagging replica's old rows again'''
+    floor = max(_lsn_value(min_lsn), _invalidated_lsn)
+    return f'{floor >> 32:X}/{floor & 0xFFFFFFFF:X}' if floor else None
+
+
+def _cached(key: Tuple, tags: Iterable[str], loader: Callable[[], Any], min_lsn: Optional[str] = None) -> Any:
+    '''Read-through TTL/LRU lookup; entries remember the LSN they were read at and are only reloaded for a
+    min_lsn that neither that LSN nor the drained invalidations cover'''
+    now = time.monotonic()
+    entry = _cache.get(key)
+    if entry and entry[0] > now and max(entry[3], _drained_lsn) >= _lsn_value(min_lsn):
+        _cache.move_to_end(key)
+        _cache_stats['hits'] += 1
+        return entry[1]
+    
+    _cache_stats['misses'] += 1
+    loaded_lsn = max(_lsn_value(min_lsn), _invalidated_lsn)
+    value = loader()
+    _cache[key] = (now + CACHE_TTL_SECONDS, value, frozenset(tags), loaded_lsn)
+    _cache.move_to_end(key)
+    while len(_cache) > CACHE_MAX_ENTRIES:
+        _cache.popitem(last=False)
+    return value
+
+
+def _cache_headers() -> Dict[str, str]:
+    total = _cache_stats['hits'] + _cache_stats['misses']
+    ratio = _cache_stats['hits'] / total if total else 0.0
+    return {
+        'X-Cache-Hits': str(_cache_stats['hits']),
+        'X-Cache-Misses': str(_cache_stats['misses']),
+        'X-Cache-Hit-Ratio': f'{ratio:.3f}'
+    }
+
+
+REPLICA_DSNS = [d.strip() for d in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if d.strip()]
+REPLICA_MAX_LAG_SECONDS = float(os.environ.get('REPLICA_MAX_LAG_SECONDS', '5'))
+REPLICA_CHECK_INTERVAL_SECONDS = float(os.environ.get('REPLICA_CHECK_INTERVAL_SECONDS', '10'))
+
+_replica_health: Dict[str, Tuple[float, bool]] = {}
+_replica_next = 0
+_LSN_PATTERN = re.compile(r'^[0-9A-F]{1,8}/[0-9A-F]{1,8}$', re.IGNORECASE)
+
+
+def _lsn_value(lsn: Optional[str]) -> int:
+    '''pg_lsn text "X/Y" as a comparable integer; request values are checked against _LSN_PATTERN first'''
+    if not lsn:
+        return 0
+    high, low = lsn.split('/')
+    return (int(high, 16) << 32) | int(low, 16)
+
+
+def _connect_read(dsn: str, min_lsn: Optional[str] = None):
+    '''Open a connection for read-only work: round-robin over caught-up replicas, primary as fallback'''
+    global _replica_next
+    now = time.monotonic()
+    for offset in range(len(REPLICA_DSNS)):
+        replica = REPLICA_DSNS[(_replica_next + offset) % len(REPLICA_DSNS)]
+        checked_at, healthy = _replica_health.get(replica, (0.0, False))
+        recently_checked = now - checked_at < REPLICA_CHECK_INTERVAL_SECONDS
+        if recently_checked and not healthy:
+            continue
+        try:
+            conn = psycopg2.connect(replica, connect_timeout=2)
+            if not recently_checked or min_lsn:
+                cur = conn.cursor()
+                cur.execute("""
+                    SELECT
+                        CASE WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+                             ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+                        END,
+                        %s::text IS NULL OR COALESCE(pg_last_wal_replay_lsn() >= %s::pg_lsn, FALSE)
+                """, (min_lsn, min_lsn))
+                lag, caught_up = cur.fetchone()
+                cur.close()
+                healthy = float(lag) <= REPLICA_MAX_LAG_SECONDS
+                _replica_health[replica] = (now, healthy)
+                if not (healthy and caught_up):
+                    conn.close()
+                    continue
+        except psycopg2.DataError:
+            conn.close()
+            break
+        except psycopg2.Error:
+            _replica_health[replica] = (now, False)
+            continue
+        _replica_next = (_replica_next + offset + 1) % len(REPLICA_DSNS)
+        return conn
+    return psycopg2.connect(dsn)
+
+
+SESSION_SECRET = os.environ.get('SESSION_SECRET', '')
+
+
+def _session_user_id(event: Dict[str, Any]) -> Optional[int]:
+    '''User id from a valid, unexpired X-Session-Token issued by auth; checked in-process, no DB lookup'''
+    headers = {k.lower(): v for k, v in (event.get('headers') or {}).items()}
+    parts = (headers.get('x-session-token') or '').split('.')
+    if not SESSION_SECRET or len(parts) != 3:
+        return None
+    
+    user_id, expires_at, signature = parts
+    expected = base64.urlsafe_b64encode(
+        hmac.new(SESSION_SECRET.encode(), f'{user_id}.{expires_at}'.encode(), hashlib.sha256).digest()
+    ).rstrip(b'=').decode()
+    if not hmac.compare_digest(signature.encode(errors='ignore'), expected.encode()):
+        return None
+    if not user_id.isdigit() or not expires_at.isdigit() or int(expires_at) < time.time():
+        return None
+    return int(user_id)
+
+
+RATE_LIMIT_SCOPE = 'upload'
+RATE_LIMIT_BACKEND = os.environ.get('RATE_LIMIT_BACKEND', 'memory')
+RATE_LIMIT_MAX_KEYS = int(os.environ.get('RATE_LIMIT_MAX_KEYS', '10000'))
+RATE_LIMITS = {
+    'user': (float(os.environ.get('RATE_LIMIT_USER_PER_SECOND', '0.1')), float(os.environ.get('RATE_LIMIT_USER_BURST', '6'))),
+    'ip': (float(os.environ.get('RATE_LIMIT_IP_PER_SECOND', '0.5')), float(os.environ.get('RATE_LIMIT_IP_BURST', '20'))),
+}
+DB_MAX_CONCURRENCY = int(os.environ.get('DB_MAX_CONCURRENCY', '20'))
+DB_SLOT_WAIT_SECONDS = float(os.environ.get('DB_SLOT_WAIT_SECONDS', '0.5'))
+DB_SLOT_LOCK_CLASS = 7301
+
+_buckets: 'OrderedDict[str, Tuple[float, float]]' = OrderedDict()
+_buckets_lock = threading.Lock()
+_limiter_conn = None
+
+
+def _client_ip(event: Dict[str, Any]) -> Optional[str]:
+    source_ip = ((event.get('requestContext') or {}).get('identity') or {}).get('sourceIp')
+    if source_ip:
+        return source_ip
+    headers = {k.lower(): v for k, v in (event.get('headers') or {}).items()}
+    return (headers.get('x-forwarded-for') or '').split(',')[0].strip() or None
+
+
+def _take_local(key: str, rate: float, burst: float) -> float:
+    '''Token bucket in this container; returns 0 when a token was taken, otherwise seconds until the next one'''
+    now = time.monotonic()
+    with _buckets_lock:
+        tokens, updated_at = _buckets.pop(key, (burst, now))
+        tokens = min(burst, tokens + (now - updated_at) * rate)
+        wait = 0.0 if tokens >= 1 else (1 - tokens) / rate
+        _buckets[key] = (tokens - 1 if wait == 0 else tokens, now)
+        while len(_buckets) > RATE_LIMIT_MAX_KEYS:
+            _buckets.popitem(last=False)
+    return wait
+
+
+def _limiter_connection(dsn: str):
+    '''One autocommit connection per warm container for shared buckets and write slots, reused across requests'''
+    global _limiter_conn
+    if _limiter_conn is None or _limiter_conn.closed:
+        _limiter_conn = psycopg2.connect(dsn, connect_timeout=2)
+        _limiter_conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+    return _limiter_conn
+
+
+def _take_shared(dsn: str, key: str, rate: float, burst: float) -> float:
+    '''Same bucket kept in the unlogged rate_limit_buckets table so every container draws from it'''
+    cur = _limiter_connection(dsn).cursor()
+    cur.execute("""
+        INSERT INTO rate_limit_buckets AS b (bucket_key, tokens, updated_at)
+        VALUES (%(key)s, %(burst)s - 1, now())
+        ON CONFLICT (bucket_key) DO UPDATE SET
+            tokens = LEAST(%(burst)s, b.tokens + EXTRACT(EPOCH FROM now() - b.updated_at) * %(rate)s) - 1,
+            updated_at = now()
+        WHERE LEAST(%(burst)s, b.tokens + EXTRACT(EPOCH FROM now() - b.updated_at) * %(rate)s) >= 1
+        RETURNING tokens
+    """, {'key': key, 'burst': burst, 'rate': rate})
+    if cur.fetchone():
+        cur.close()
+        return 0.0
+    
+    cur.execute("""
+        SELECT LEAST(%s, tokens + EXTRACT(EPOCH FROM now() - updated_at) * %s) FROM rate_limit_buckets WHERE bucket_key = %s
+    """, (burst, rate, key))
+    tokens = float(cur.fetchone()[0])
+    cur.close()
+    return max((1 - tokens) / rate, 0.0)
+
+
+def _rate_limited(event: Dict[str, Any], dsn: str) -> Optional[Dict[str, Any]]:
+    '''429 with Retry-After once the caller's IP or session user runs out of tokens, else None'''
+    global _limiter_conn
+    for kind, subject in (('ip', _client_ip(event)), ('user', _session_user_id(event))):
+        if subject is None:
+            continue
+        rate, burst = RATE_LIMITS[kind]
+        key = f'{RATE_LIMIT_SCOPE}:{kind}:{subject}'
+        wait = None
+        if RATE_LIMIT_BACKEND == 'postgres':
+            try:
+                wait = _take_shared(dsn, key, rate, burst)
+            except psycopg2.Error:
+                _limiter_conn = None
+        if wait is None:
+            wait = _take_local(key, rate, burst)
+        if wait > 0:
+            return {
+                'statusCode': 429,
+                'headers': {
+                    'Content-Type': 'application/json',
+                    'Access-Control-Allow-Origin': '*',
+                    'Retry-After': str(math.ceil(wait))
+                },
+                'body': json.dumps({'error': 'Too many requests, slow down'}),
+                'isBase64Encoded': False
+            }
+    return None
+
+
+def _acquire_db_slot(dsn: str) -> Optional[int]:
+    '''Take one of DB_MAX_CONCURRENCY cluster-wide write slots, held as a session advisory lock that voting and
+    photos share; None when every slot stays taken for DB_SLOT_WAIT_SECONDS or the database is unreachable'''
+    global _limiter_conn
+    deadline = time.monotonic() + DB_SLOT_WAIT_SECONDS
+    offset = random.randrange(DB_MAX_CONCURRENCY)
+    while True:
+        try:
+            cur = _limiter_connection(dsn).cursor()
+            cur.execute("""
+                SELECT slot FROM (SELECT (s + %s) %% %s AS slot FROM generate_series(0, %s - 1) s) slots
+                WHERE pg_try_advisory_lock(%s, slot)
+                LIMIT 1
+            """, (offset, DB_MAX_CONCURRENCY, DB_MAX_CONCURRENCY, DB_SLOT_LOCK_CLASS))
+            row = cur.fetchone()
+            cur.close()
+        except psycopg2.Error:
+            _limiter_conn = None
+            return None
+        if row:
+            return row[0]
+        if time.monotonic() >= deadline:
+            return None
+        time.sleep(0.05)
+
+
+def _release_db_slot(slot: int) -> None:
+    global _limiter_conn
+    try:
+        cur = _limiter_conn.cursor()
+        cur.execute("SELECT pg_advisory_unlock(%s, %s)", (DB_SLOT_LOCK_CLASS, slot))
+        cur.close()
+    except psycopg2.Error:
+        _limiter_conn.close()
+        _limiter_conn = None
+
+
+def _overloaded_response() -> Dict[str, Any]:
+    return {
+        'statusCode': 503,
+        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*', 'Retry-After': '1'},
+        'body': json.dumps({'error': 'Server is busy, try again shortly'}),
+        'isBase64Encoded': False
+    }
+
+
+PHASH_MAX_DISTANCE = int(os.environ.get('PHASH_MAX_DISTANCE', '6'))
+PHASH_INDEX_REBUILD_SECONDS = float(os.environ.get('PHASH_INDEX_REBUILD_SECONDS', '3600'))
+DUPLICATE_POLICY = os.environ.get('DUPLICATE_POLICY', 'reject')
+_HASH_MASK = (1 << 64) - 1
+
+
+def _hamming(a: int, b: int) -> int:
+    return ((a ^ b) & _HASH_MASK).bit_count()
+
+
+MAX_IMAGE_PIXELS = int(os.environ.get('MAX_IMAGE_PIXELS', str(4096 * 4096)))
+
+
+def _open_image(image_bytes: bytes) -> Image.Image:
+    '''Read only the header and refuse oversized images before any pixels are decoded'''
+    image = Image.open(io.BytesIO(image_bytes))
+    width, height = image.size
+    if width * height > MAX_IMAGE_PIXELS:
+        raise ValueError(f'Image is {width}x{height}, over the {MAX_IMAGE_PIXELS} pixel limit')
+    return image
+
+
+def _image_hashes(data_url: str) -> Tuple[str, int]:
+    '''SHA-256 of the decoded upload plus a 64-bit dHash (signed, to fit BIGINT) that survives re-encoding'''
+    image_bytes = base64.b64decode(data_url.split(',', 1)[-1])
+    content_hash = hashlib.sha256(image_bytes).hexdigest()
+    
+    pixels = list(_open_image(image_bytes).convert('L').resize((9, 8), Image.LANCZOS).getdata())
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            bits = (bits << 1) | int(pixels[row * 9 + col] > pixels[row * 9 + col + 1])
+    return content_hash, bits - (1 << 64) if bits >= (1 << 63) else bits
+
+
+BLURHASH_COMPONENTS = (4, 3)
+_BASE83 = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz#$%*+,-.:;=?@[]^_{|}~'
+
+
+def _base83(value: int, length: int) -> str:
+    return ''.join(_BASE83[(value // 83 ** (length - i - 1)) % 83] for i in range(length))
+
+
+def _srgb_to_linear(value: int) -> float:
+    v = value / 255
+    return v / 12.92 if v <= 0.04045 else ((v + 0.055) / 1.055) ** 2.4
+
+
+def _linear_to_srgb(value: float) -> int:
+    v = max(0.0, min(1.0, value))
+    return int(v * 12.92 * 255 + 0.5) if v <= 0.0031308 else int((1.055 * v ** (1 / 2.4) - 0.055) * 255 + 0.5)
+
+
+def _blurhash(data_url: str) -> str:
+    '''~28-character blurhash of the image, small enough to inline in list responses'''
+    image = _open_image(base64.b64decode(data_url.split(',', 1)[-1])).convert('RGB')
+    image.thumbnail((32, 32))
+    width, height = image.size
+    pixels = [tuple(_srgb_to_linear(c) for c in px) for px in image.getdata()]
+    x_components, y_components = BLURHASH_COMPONENTS
+    
+    factors = []
+    for j in range(y_components):
+        cos_y = [math.cos(math.pi * j * y / height) for y in range(height)]
+        for i in range(x_components):
+            cos_x = [math.cos(math.pi * i * x / width) for x in range(width)]
+            norm = (1 if i == 0 and j == 0 else 2) / (width * height)
+            r = g = b = 0.0
+            for y in range(height):
+                for x in range(width):
+                    basis = cos_x[x] * cos_y[y]
+                    pr, pg, pb = pixels[y * width + x]
+                    r += basis * pr
+                    g += basis * pg
+                    b += basis * pb
+            factors.append((r * norm, g * norm, b * norm))
+    
+    dc, ac = factors[0], factors[1:]
+    quantised_max = max(0, min(82, int(max(abs(c) for f in ac for c in f) * 166 - 0.5)))
+    max_value = (quantised_max + 1) / 166
+    
+    encoded = _base83((x_components - 1) + (y_components - 1) * 9, 1) + _base83(quantised_max, 1)
+    encoded += _base83((_linear_to_srgb(dc[0]) << 16) + (_linear_to_srgb(dc[1]) << 8) + _linear_to_srgb(dc[2]), 4)
+    for f in ac:
+        q = [max(0, min(18, int(math.floor(math.copysign(abs(c / max_value) ** 0.5, c) * 9 + 9.5)))) for c in f]
+        encoded += _base83(q[0] * 19 * 19 + q[1] * 19 + q[2], 2)
+    return encoded
+
+
+class _BKTree:
+    '''Burkhard-Keller tree over perceptual hashes with Hamming distance as the metric'''
+    
+    def __init__(self):
+        self.root = None
+    
+    def add(self, phash: int, photo_id: int) -> None:
+        if self.root is None:
+            self.root = (phash, [photo_id], {})
+            return
+        node = self.root
+        while True:
+            distance = _hamming(phash, node[0])
+            if distance == 0:
+                if photo_id not in node[1]:
+                    node[1].append(photo_id)
+                return
+            if distance not in node[2]:
+                node[2][distance] = (phash, [photo_id], {})
+                return
+            node = node[2][distance]
+    
+    def search(self, phash: int, radius: int) -> List[Tuple[int, int]]:
+        matches = []
+        stack = [self.root] if self.root else []
+        while stack:
+            node = stack.pop()
+            distance = _hamming(phash, node[0])
+            if distance <= radius:
+                matches.extend((photo_id, distance) for photo_id in node[1])
+            stack.extend(child for edge, child in node[2].items() if distance - radius <= edge <= distance + radius)
+        return sorted(matches, key=lambda match: match[1])
+
+
+_phash_tree = _BKTree()
+_phash_synced_id = 0
+_phash_built_at = 0.0
+
+
+def _sync_phash_index(cur) -> None:
+    '''Pull hashes stored since the last sync into the warm tree; rebuild periodically to pick up backfills'''
+    global _phash_tree, _phash_synced_id, _phash_built_at
+    if time.monotonic() - _phash_built_at > PHASH_INDEX_REBUILD_SECONDS:
+        _phash_tree = _BKTree()
+        _phash_synced_id = 0
+        _phash_built_at = time.monotonic()
+    
+    cur.execute(
+        "SELECT id, phash FROM photos WHERE id > %s AND phash IS NOT NULL ORDER BY id",
+        (_phash_synced_id,)
+    )
+    for row in cur.fetchall():
+        _phash_tree.add(row['phash'], row['id'])
+        _phash_synced_id = row['id']
+
+
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     '''
     Business: Upload and retrieve user photos
@@ -11,6 +473,26 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     Returns: HTTP response with photos data
     '''
     method: str = event.get('httpMethod', 'GET')
+    if method in ('GET', 'OPTIONS'):
+        return _handle(event)
+    
+    dsn = os.environ.get('DATABASE_URL')
+    if method == 'POST':
+        limited = _rate_limited(event, dsn)
+        if limited:
+            return limited
+    
+    slot = _acquire_db_slot(dsn)
+    if slot is None:
+        return _overloaded_response()
+    try:
+        return _handle(event)
+    finally:
+        _release_db_slot(slot)
+
+
+def _handle(event: Dict[str, Any]) -> Dict[str, Any]:
+    method: str = event.get('httpMethod', 'GET')
     
     if method == 'OPTIONS':
         return {
@@ -18,7 +500,7 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             'headers': {
                 'Access-Control-Allow-Origin': '*',
                 'Access-Control-Allow-Methods': 'GET, POST, DELETE, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type, X-User-Id',
+                'Access-Control-Allow-Headers': 'Content-Type, X-User-Id, X-Session-Token',
                 'Access-Control-Max-Age': '86400'
             },
             'body': '',
@@ -26,40 +508,71 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         }
     
     dsn = os.environ.get('DATABASE_URL')
-    conn = psycopg2.connect(dsn)
-    cur = conn.cursor(cursor_factory=RealDictCursor)
     
     if method == 'GET':
         params = event.get('queryStringParameters', {})
         user_id = params.get('user_id')
+        min_lsn = params.get('min_lsn')
         
-        cur.execute("""
-            SELECT p.id, p.rating, c.name as category_name, c.id as category_id
-            FROM photos p
-            JOIN categories c ON p.category_id = c.id
-            WHERE p.user_id = %s
-            ORDER BY c.display_order, p.created_at
-        """, (user_id,)) if user_id else cur.execute("""
-            SELECT p.id, p.rating, c.name as category_name, c.id as category_id, u.username
-            FROM photos p
-            JOIN categories c ON p.category_id = c.id
-            JOIN users u ON p.user_id = u.id
-            ORDER BY p.rating DESC
-            LIMIT 50
-        """)
-        
-        photos = cur.fetchall()
-        cur.close()
-        conn.close()
+        if min_lsn and not _LSN_PATTERN.match(min_lsn):
+            return {
+                'statusCode': 400,
+                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                'body': json.dumps({'error': 'Invalid min_lsn'}),
+                'isBase64Encoded': False
+            }
+        
+        try:
+            season_id = int(params['season_id']) if params.get('season_id') else None
+        except ValueError:
+            return {
+                'statusCode': 400,
+                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                'body': json.dumps({'error': 'season_id must be an integer'}),
+                'isBase64Encoded': False
+            }
+        
+        def load_photos():
+            conn = _connect_read(dsn, _read_lsn(min_lsn))
+            cur = conn.cursor(cursor_factory=RealDictCursor)
+            cur.execute("""
+                SELECT p.id, p.rating, p.placeholder, c.name as category_name, c.id as category_id
+                FROM photos p
+                JOIN categories c ON p.category_id = c.id
+                WHERE p.season_id = COALESCE(%s::int, (SELECT id FROM seasons WHERE is_active))
+                AND p.user_id = %s
+                ORDER BY c.display_order, p.created_at
+            """, (season_id, user_id)) if user_id else cur.execute("""
+                SELECT p.id, p.rating, p.placeholder, c.name as category_name, c.id as category_id, u.username
+                FROM photos p
+                JOIN categories c ON p.category_id = c.id
+                JOIN users u ON p.user_id = u.id
+                WHERE p.season_id = COALESCE(%s::int, (SELECT id FROM seasons WHERE is_active))
+                ORDER BY p.rating DESC
+                LIMIT 50
+            """, (season_id,))
+            photos = [dict(photo) for photo in cur.fetchall()]
+            cur.close()
+            conn.close()
+            return photos
+        
+        _drain_invalidations(dsn, min_lsn)
+        if user_id:
+            photos = _cached(('user_photos', user_id, season_id), {f'user:{user_id}', 'season'}, load_photos, min_lsn=min_lsn)
+        else:
+            photos = _cached(('top_photos', season_id), {'leaderboard', 'season'}, load_photos, min_lsn=min_lsn)
         
         return {
             'statusCode': 200,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps([dict(photo) for photo in photos]),
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*', **_cache_headers()},
+            'body': json.dumps(photos),
             'isBase64Encoded': False
         }
     
-    elif method == 'POST':
+    conn = psycopg2.connect(dsn)
+    cur = conn.cursor(cursor_factory=RealDictCursor)
+    
+    if method == 'POST':
         body = event.get('body', '{}')
         if not body or body == '':
             body = '{}'
@@ -79,6 +592,17 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                 'isBase64Encoded': False
             }
         
+        session_user_id = _session_user_id(event)
+        if session_user_id is None or str(session_user_id) != str(user_id):
+            cur.close()
+            conn.close()
+            return {
+                'statusCode': 401 if session_user_id is None else 403,
+                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                'body': json.dumps({'error': 'Invalid or expired session' if session_user_id is None else 'Session does not match user_id'}),
+                'isBase64Encoded': False
+            }
+        
         if len(image_url) > 250000:
             cur.close()
             conn.close()
@@ -89,9 +613,23 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                 'isBase64Encoded': False
             }
         
+        cur.execute("SELECT id FROM seasons WHERE is_active")
+        season = cur.fetchone()
+        
+        if not season:
+            cur.close()
+            conn.close()
+            return {
+                'statusCode': 400,
+                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                'body': json.dumps({'error': 'No active contest season'}),
+                'isBase64Encoded': False
+            }
+        
+        season_id = season['id']
         cur.execute(
-            "SELECT COUNT(*) as count FROM photos WHERE user_id = %s AND category_id = %s",
-            (user_id, category_id)
+            "SELECT COUNT(*) as count FROM photos WHERE season_id = %s AND user_id = %s AND category_id = %s",
+            (season_id, user_id, category_id)
         )
         count = cur.fetchone()['count']
         
@@ -105,19 +643,78 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                 'isBase64Encoded': False
             }
         
+        try:
+            content_hash, phash = _image_hashes(image_url)
+        except (ValueError, OSError, Image.DecompressionBombError):
+            cur.close()
+            conn.close()
+            return {
+                'statusCode': 400,
+                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                'body': json.dumps({'error': 'Invalid image data'}),
+                'isBase64Encoded': False
+            }
+        
         cur.execute(
-            "INSERT INTO photos (user_id, category_id, image_url, thumbnail_url) VALUES (%s, %s, %s, %s) RETURNING id",
-            (user_id, category_id, image_url, thumbnail_url)
+            "SELECT id FROM photos WHERE season_id = %s AND content_hash = %s LIMIT 1",
+            (season_id, content_hash)
+        )
+        exact = cur.fetchone()
+        duplicate_of = exact['id'] if exact else None
+        
+        if not duplicate_of:
+            _sync_phash_index(cur)
+            candidates = _phash_tree.search(phash, PHASH_MAX_DISTANCE)
+            if candidates:
+                cur.execute(
+                    "SELECT id FROM photos WHERE season_id = %s AND id = ANY(%s)",
+                    (season_id, [photo_id for photo_id, _ in candidates])
+                )
+                alive = {row['id'] for row in cur.fetchall()}
+                duplicate_of = next((photo_id for photo_id, _ in candidates if photo_id in alive), None)
+        
+        if duplicate_of and (exact or DUPLICATE_POLICY == 'reject'):
+            cur.close()
+            conn.close()
+            return {
+                'statusCode': 409,
+                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                'body': json.dumps({'error': 'This photo has already been uploaded', 'duplicate_of': duplicate_of}),
+                'isBase64Encoded': False
+            }
+        
+        try:
+            placeholder = _blurhash(thumbnail_url or image_url)
+        except (ValueError, OSError, Image.DecompressionBombError):
+            placeholder = None
+        
+        cur.execute(
+            """
+            INSERT INTO photos (season_id, user_id, category_id, image_url, thumbnail_url, content_hash, phash, duplicate_of, placeholder)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s) RETURNING id
+            """,
+            (season_id, user_id, category_id, image_url, thumbnail_url, content_hash, phash, duplicate_of, placeholder)
         )
         photo_id = cur.fetchone()['id']
+        cur.execute("SELECT pg_notify(%s, %s)", (CACHE_CHANNEL, f'leaderboard,user:{user_id},photo_content:{photo_id}'))
         conn.commit()
+        write_lsn = None
+        if REPLICA_DSNS:
+            cur.execute("SELECT pg_current_wal_lsn()::text AS lsn")
+            write_lsn = cur.fetchone()['lsn']
         cur.close()
         conn.close()
+        _phash_tree.add(phash, photo_id)
         
         return {
             'statusCode': 200,
             'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'photo_id': photo_id, 'message': 'Photo uploaded successfully'}),
+            'body': json.dumps({
+                'photo_id': photo_id,
+                'message': 'Photo uploaded successfully',
+                'duplicate_of': duplicate_of,
+                'lsn': write_lsn
+            }),
             'isBase64Encoded': False
         }
     
@@ -135,23 +732,61 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                 'isBase64Encoded': False
             }
         
+        session_user_id = _session_user_id(event)
+        if session_user_id is None:
+            cur.close()
+            conn.close()
+            return {
+                'statusCode': 401,
+                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                'body': json.dumps({'error': 'Invalid or expired session'}),
+                'isBase64Encoded': False
+            }
+        
+        cur.execute("SELECT user_id, season_id FROM photos WHERE id = %s", (photo_id,))
+        owner = cur.fetchone()
+        if not owner or owner['user_id'] != session_user_id:
+            cur.close()
+            conn.close()
+            return {
+                'statusCode': 404 if not owner else 403,
+                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                'body': json.dumps({'error': 'Photo not found' if not owner else 'Not your photo'}),
+                'isBase64Encoded': False
+            }
+        
+        season_id = owner['season_id']
         cur.execute(
-            "DELETE FROM votes WHERE photo1_id = %s OR photo2_id = %s OR winner_photo_id = %s",
-            (photo_id, photo_id, photo_id)
+            "DELETE FROM votes WHERE season_id = %s AND (photo1_id = %s OR photo2_id = %s OR winner_photo_id = %s)",
+            (season_id, photo_id, photo_id, photo_id)
         )
         cur.execute(
-            "DELETE FROM shown_photos WHERE photo_id = %s",
-            (photo_id,)
+            "DELETE FROM shown_photos WHERE season_id = %s AND photo_id = %s",
+            (season_id, photo_id)
         )
-        cur.execute("DELETE FROM photos WHERE id = %s", (photo_id,))
+        cur.execute(
+            "DELETE FROM matchup_queue WHERE photo1_id = %s OR photo2_id = %s",
+            (photo_id, photo_id)
+        )
+        cur.execute("DELETE FROM photos WHERE season_id = %s AND id = %s RETURNING user_id", (season_id, photo_id))
+        deleted = cur.fetchone()
+        
+        tags = ['leaderboard', f'photo_content:{photo_id}']
+        if deleted:
+            tags.append(f'user:{deleted["user_id"]}')
+        cur.execute("SELECT pg_notify(%s, %s)", (CACHE_CHANNEL, ','.join(tags)))
         conn.commit()
+        write_lsn = None
+        if REPLICA_DSNS:
+            cur.execute("SELECT pg_current_wal_lsn()::text AS lsn")
+            write_lsn = cur.fetchone()['lsn']
         cur.close()
         conn.close()
         
         return {
             'statusCode': 200,
             'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'message': 'Photo deleted successfully'}),
+            'body': json.dumps({'message': 'Photo deleted successfully', 'lsn': write_lsn}),
             'isBase64Encoded': False
         }
     
@@ -1,13 +1,374 @@
+import bisect
 import json
 import os
-from typing import Dict, Any, List
+import re
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone, timedelta
+from typing import Dict, Any, Optional, List, Callable, Iterable, Tuple
 import psycopg2
+from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
 from psycopg2.extras import RealDictCursor
 
+CACHE_CHANNEL = 'cache_invalidate'
+CACHE_TTL_SECONDS = float(os.environ.get('CACHE_TTL_SECONDS', '300'))
+CACHE_MAX_ENTRIES = int(os.environ.get('CACHE_MAX_ENTRIES', '64'))
+
+_cache: 'OrderedDict[Tuple, Tuple[float, Any, frozenset, int]]' = OrderedDict()
+_cache_stats = {'hits': 0, 'misses': 0}
+_listener = None
+_drained_lsn = 0
+_invalidated_lsn = 0
+
+
+def _drain_invalidations(dsn: str, min_lsn: Optional[str] = None) -> None:
+    '''Apply pending NOTIFY invalidations; a lost listener means missed events, so flush everything.
+    A min_lsn past what was drained so far costs one round trip on the listener, after which every
+    invalidation committed up to the caller's own write has been delivered and applied'''
+    global _listener, _drained_lsn, _invalidated_lsn
+    try:
+        if _listener is None or _listener.closed:
+            _cache.clear()
+            _listener = psycopg2.connect(dsn)
+            _listener.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+            _listener.cursor().execute(f'LISTEN {CACHE_CHANNEL}')
+        _listener.poll()
+        if (_listener.notifies and REPLICA_DSNS) or _lsn_value(min_lsn) > _drained_lsn:
+            cur = _listener.cursor()
+            cur.execute('SELECT pg_current_wal_lsn()::text')
+            _drained_lsn = _lsn_value(cur.fetchone()[0])
+            cur.close()
+    except psycopg2.Error:
+        _listener = None
+        _cache.clear()
+        _forget_users()
+        return
+    
+    tags = set()
+    while _listener.notifies:
+        tags.update(_listener.notifies.pop(0).payload.split(','))
+    if tags:
+        _invalidated_lsn = max(_invalidated_lsn, _drained_lsn)
+    if tags & {'users', '*'}:
+        _forget_users()
+    if '*' in tags:
+        _cache.clear()
+    elif tags:
+        for key in [k for k, (_, _, t, _) in _cache.items() if t & tags]:
+            del _cache[key]
+
+
+def _read_lsn(min_lsn: Optional[str]) -> Optional[str]:
+    '''Position a read must reflect: the caller's own write, or the newest invalidation applied here, so a
+    reload after NOTIFY never caches a lagging replica's old rows again'''
+    floor = max(_lsn_value(min_lsn), _invalidated_lsn)
+    return f'{floor >> 32:X}/{floor & 0xFFFFFFFF:X}' if floor else None
+
+
+def _cached(key: Tuple, tags: Iterable[str], loader: Callable[[], Any], min_lsn: Optional[str] = None) -> Any:
+    '''Read-through TTL/LRU lookup; entries remember the LSN they were read at and are only reloaded for a
+    min_lsn that neither that LSN nor the drained invalidations cover'''
+    now = time.monotonic()
+    entry = _cache.get(key)
+    if entry and entry[0] > now and max(entry[3], _drained_lsn) >= _lsn_value(min_lsn):
+        _cache.move_to_end(key)
+        _cache_stats['hits'] += 1
+        return entry[1]
+    
+    _cache_stats['misses'] += 1
+    loaded_lsn = max(_lsn_value(min_lsn), _invalidated_lsn)
+    value = loader()
+    _cache[key] = (now + CACHE_TTL_SECONDS, value, frozenset(tags), loaded_lsn)
+    _cache.move_to_end(key)
+    while len(_cache) > CACHE_MAX_ENTRIES:
+        _cache.popitem(last=False)
+    return value
+
+
+def _cache_headers() -> Dict[str, str]:
+    total = _cache_stats['hits'] + _cache_stats['misses']
+    ratio = _cache_stats['hits'] / total if total else 0.0
+    return {
+        'X-Cache-Hits': str(_cache_stats['hits']),
+        'X-Cache-Misses': str(_cache_stats['misses']),
+        'X-Cache-Hit-Ratio': f'{ratio:.3f}'
+    }
+
+
+REPLICA_DSNS = [d.strip() for d in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if d.strip()]
+REPLICA_MAX_LAG_SECONDS = float(os.environ.get('REPLICA_MAX_LAG_SECONDS', '5'))
+REPLICA_CHECK_INTERVAL_SECONDS = float(os.environ.get('REPLICA_CHECK_INTERVAL_SECONDS', '10'))
+
+_replica_health: Dict[str, Tuple[float, bool]] = {}
+_replica_next = 0
+_LSN_PATTERN = re.compile(r'^[0-9A-F]{1,8}/[0-9A-F]{1,8}$', re.IGNORECASE)
+
+
+def _lsn_value(lsn: Optional[str]) -> int:
+    '''pg_lsn text "X/Y" as a comparable integer; request values are checked against _LSN_PATTERN first'''
+    if not lsn:
+        return 0
+    high, low = lsn.split('/')
+    return (int(high, 16) << 32) | int(low, 16)
+
+
+def _connect_read(dsn: str, min_lsn: Optional[str] = None):
+    '''Open a connection for read-only work: round-robin over caught-up replicas, primary as fallback'''
+    global _replica_next
+    now = time.monotonic()
+    for offset in range(len(REPLICA_DSNS)):
+        replica = REPLICA_DSNS[(_replica_next + offset) % len(REPLICA_DSNS)]
+        checked_at, healthy = _replica_health.get(replica, (0.0, False))
+        recently_checked = now - checked_at < REPLICA_CHECK_INTERVAL_SECONDS
+        if recently_checked and not healthy:
+            continue
+        try:
+            conn = psycopg2.connect(replica, connect_timeout=2)
+            if not recently_checked or min_lsn:
+                cur = conn.cursor()
+                cur.execute("""
+                    SELECT
+                        CASE WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+                             ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+                        END,
+                        %s::text IS NULL OR COALESCE(pg_last_wal_replay_lsn() >= %s::pg_lsn, FALSE)
+                """, (min_lsn, min_lsn))
+                lag, caught_up = cur.fetchone()
+                cur.close()
+                healthy = float(lag) <= REPLICA_MAX_LAG_SECONDS
+                _replica_health[replica] = (now, healthy)
+                if not (healthy and caught_up):
+                    conn.close()
+                    continue
+        except psycopg2.DataError:
+            conn.close()
+            break
+        except psycopg2.Error:
+            _replica_health[replica] = (now, False)
+            continue
+        _replica_next = (_replica_next + offset + 1) % len(REPLICA_DSNS)
+        return conn
+    return psycopg2.connect(dsn)
+
+
+USER_INDEX_TOP_K = int(os.environ.get('USER_INDEX_TOP_K', '10'))
+USER_INDEX_MAX_PREFIX = int(os.environ.get('USER_INDEX_MAX_PREFIX', '16'))
+USER_INDEX_REBUILD_SECONDS = float(os.environ.get('USER_INDEX_REBUILD_SECONDS', '600'))
+USER_SEARCH_MAX_LIMIT = 25
+USER_SEARCH_CACHE_ENTRIES = int(os.environ.get('USER_SEARCH_CACHE_ENTRIES', '256'))
+
+
+class _PrefixTrie:
+    '''Lower-cased username prefixes; every node keeps its top-K users by activity, so a lookup is one walk'''
+    
+    def __init__(self):
+        self.root = ({}, [])
+    
+    def add(self, user_id: int, username: str, activity: int) -> None:
+        entry = (-activity, user_id, username)
+        node = self.root
+        for char in username.lower()[:USER_INDEX_MAX_PREFIX]:
+            node = node[0].setdefault(char, ({}, []))
+            top = node[1]
+            if len(top) < USER_INDEX_TOP_K or entry < top[-1]:
+                bisect.insort(top, entry)
+                del top[USER_INDEX_TOP_K:]
+    
+    def search(self, prefix: str) -> Optional[List[Tuple[int, int, str]]]:
+        '''None when the prefix is deeper than the trie indexes'''
+        if len(prefix) > USER_INDEX_MAX_PREFIX:
+            return None
+        node = self.root
+        for char in prefix.lower():
+            node = node[0].get(char)
+            if node is None:
+                return []
+        return node[1]
+
+
+_user_trie = _PrefixTrie()
+_user_synced_id = 0
+_user_built_at = 0.0
+_user_synced_at = 0.0
+_user_index_stale = True
+
+# Fuzzy results get their own LRU so a burst of keystrokes cannot evict the leaderboard from _cache
+_fuzzy_results: 'OrderedDict[Tuple[str, int], Tuple[float, List[Dict[str, Any]]]]' = OrderedDict()
+
+
+def _forget_users() -> None:
+    '''A registration (or a lost listener) makes the trie miss users and cached fuzzy results incomplete'''
+    global _user_index_stale
+    _user_index_stale = True
+    _fuzzy_results.clear()
+
+
+def _sync_user_index(dsn: str) -> None:
+    '''Pull users registered since the last sync into the warm trie; rebuild periodically to re-rank by activity'''
+    global _user_trie, _user_synced_id, _user_built_at, _user_synced_at, _user_index_stale
+    if time.monotonic() - _user_built_at > USER_INDEX_REBUILD_SECONDS:
+        _user_trie = _PrefixTrie()
+        _user_synced_id = 0
+        _user_built_at = time.monotonic()
+    _user_index_stale = False
+    _user_synced_at = time.monotonic()
+    
+    conn = _connect_read(dsn, _read_lsn(None))
+    cur = conn.cursor(cursor_factory=RealDictCursor)
+    cur.execute("""
+        SELECT u.id, u.username, COALESCE(a.activity_count, 0) AS activity
+        FROM users u
+        LEFT JOIN user_activity a ON a.user_id = u.id
+        WHERE u.id > %s
+        ORDER BY u.id
+    """, (_user_synced_id,))
+    for row in cur.fetchall():
+        _user_trie.add(row['id'], row['username'], row['activity'])
+        _user_synced_id = row['id']
+    cur.close()
+    conn.close()
+
+
+def _load_fuzzy_users(dsn: str, query: str, limit: int) -> List[Dict[str, Any]]:
+    '''Substring and trigram-similarity matches served by the pg_trgm index, most active first'''
+    pattern = '%' + query.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+    conn = _connect_read(dsn, _read_lsn(None))
+    cur = conn.cursor(cursor_factory=RealDictCursor)
+    cur.execute("""
+        SELECT u.id, u.username, COALESCE(a.activity_count, 0) AS activity
+        FROM users u
+        LEFT JOIN user_activity a ON a.user_id = u.id
+        WHERE u.username ILIKE %s OR u.username %% %s
+        ORDER BY activity DESC, similarity(u.username, %s) DESC, u.id
+        LIMIT %s
+    """, (pattern, query, query, limit))
+    users = [dict(row) for row in cur.fetchall()]
+    cur.close()
+    conn.close()
+    return users
+
+
+def _search_users(dsn: str, query: str, limit: int) -> List[Dict[str, Any]]:
+    now = time.monotonic()
+    if _user_index_stale or now - _user_synced_at > CACHE_TTL_SECONDS:
+        _sync_user_index(dsn)
+    prefix_hits = _user_trie.search(query) or []
+    users = [{'id': user_id, 'username': username, 'activity': -activity} for activity, user_id, username in prefix_hits[:limit]]
+    if len(users) >= limit:
+        return users
+    
+    seen = {user['id'] for user in users}
+    key = (query.lower(), limit)
+    entry = _fuzzy_results.get(key)
+    if entry and entry[0] > now:
+        _fuzzy_results.move_to_end(key)
+        fuzzy = entry[1]
+    else:
+        fuzzy = _load_fuzzy_users(dsn, query, limit)
+        _fuzzy_results[key] = (now + CACHE_TTL_SECONDS, fuzzy)
+        _fuzzy_results.move_to_end(key)
+        while len(_fuzzy_results) > USER_SEARCH_CACHE_ENTRIES:
+            _fuzzy_results.popitem(last=False)
+    users.extend(user for user in fuzzy if user['id'] not in seen)
+    return users[:limit]
+
+
+TREND_MAX_ENTITIES = 1000
+TREND_MAX_DAYS = 730
+
+
+def _barnaul_today():
+    '''Rollups are keyed by the Barnaul date maintenance snapshots on, not the database server's CURRENT_DATE'''
+    return datetime.now(timezone(timedelta(hours=7))).date()
+
+
+def _trend_bucket_days(days: int) -> int:
+    '''Coarsest rollup that still gives a readable chart: daily up to a month, weekly up to half a year'''
+    if days <= 31:
+        return 1
+    return 7 if days <= 180 else 30
+
+
+def _load_trends(dsn: str, min_lsn: Optional[str], entity_type: str, ids: List[int], days: int, top: int) -> Dict[str, Any]:
+    bucket_days = _trend_bucket_days(days)
+    conn = _connect_read(dsn, _read_lsn(min_lsn))
+    cur = conn.cursor(cursor_factory=RealDictCursor)
+    
+    if not ids:
+        cur.execute("""
+            SELECT entity_id FROM stats_rollups
+            WHERE entity_type = %s AND bucket_days = 1
+            AND bucket_start = (SELECT MAX(bucket_start) FROM stats_rollups WHERE entity_type = %s AND bucket_days = 1)
+            AND rank_last <= %s
+            ORDER BY rank_last
+        """, (entity_type, entity_type, top))
+        ids = [row['entity_id'] for row in cur.fetchall()]
+    
+    cur.execute("""
+        SELECT entity_id, bucket_start, value_last, value_max, rank_last, rank_best
+        FROM stats_rollups
+        WHERE entity_type = %s AND bucket_days = %s AND entity_id = ANY(%s)
+        AND bucket_start >= %s
+        ORDER BY entity_id, bucket_start
+    """, (entity_type, bucket_days, ids, _barnaul_today() - timedelta(days=days)))
+    
+    series: Dict[str, List[Dict[str, Any]]] = {str(entity_id): [] for entity_id in ids}
+    for row in cur.fetchall():
+        series[str(row['entity_id'])].append({
+            'date': str(row['bucket_start']),
+            'value': row['value_last'],
+            'max': row['value_max'],
+            'rank': row['rank_last'],
+            'best_rank': row['rank_best']
+        })
+    
+    cur.close()
+    conn.close()
+    return {'entity': entity_type, 'days': days, 'bucket_days': bucket_days, 'series': series}
+
+
+def _load_movement(dsn: str, min_lsn: Optional[str], entity_type: str, top: int) -> Dict[str, Any]:
+    conn = _connect_read(dsn, _read_lsn(min_lsn))
+    cur = conn.cursor(cursor_factory=RealDictCursor)
+    cur.execute("""
+        SELECT cur.entity_id, cur.bucket_start, cur.value_last AS value, cur.rank_last AS rank,
+               prev.rank_last AS previous_rank, u.username
+        FROM stats_rollups cur
+        LEFT JOIN stats_rollups prev
+            ON prev.entity_type = cur.entity_type AND prev.bucket_days = 1
+            AND prev.entity_id = cur.entity_id AND prev.bucket_start = cur.bucket_start - 1
+        LEFT JOIN users u ON cur.entity_type = 'user' AND u.id = cur.entity_id
+        WHERE cur.entity_type = %s AND cur.bucket_days = 1
+        AND cur.bucket_start = (SELECT MAX(bucket_start) FROM stats_rollups WHERE entity_type = %s AND bucket_days = 1)
+        AND cur.rank_last <= %s
+        ORDER BY cur.rank_last, cur.entity_id
+    """, (entity_type, entity_type, top))
+    rows = cur.fetchall()
+    cur.close()
+    conn.close()
+    
+    return {
+        'entity': entity_type,
+        'date': str(rows[0]['bucket_start']) if rows else None,
+        'entries': [
+            {
+                'id': row['entity_id'],
+                'username': row['username'],
+                'value': row['value'],
+                'rank': row['rank'],
+                'previous_rank': row['previous_rank'],
+                'movement': row['previous_rank'] - row['rank'] if row['previous_rank'] is not None else None
+            }
+            for row in rows
+        ]
+    }
+
+
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     '''
-    Business: Get statistics for homepage (top users, top photos)
-    Args: event with httpMethod GET, query params (user_id optional)
+    Business: Get statistics for homepage (top users, top photos), rating/activity trends, rank movement and username search
+    Args: event with httpMethod GET, query params (user_id, season_id optional; active season by default;
+          action=trends|movement with entity=user|photo, ids, days, top; action=search_users with q, limit)
     Returns: HTTP response with statistics data
     '''
     method: str = event.get('httpMethod', 'GET')
@@ -35,52 +396,145 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     
     params = event.get('queryStringParameters', {})
     user_id = params.get('user_id')
+    min_lsn = params.get('min_lsn')
+    
+    if min_lsn and not _LSN_PATTERN.match(min_lsn):
+        return {
+            'statusCode': 400,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({'error': 'Invalid min_lsn'}),
+            'isBase64Encoded': False
+        }
+    
+    try:
+        season_id = int(params['season_id']) if params.get('season_id') else None
+    except ValueError:
+        return {
+            'statusCode': 400,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({'error': 'season_id must be an integer'}),
+            'isBase64Encoded': False
+        }
     
     dsn = os.environ.get('DATABASE_URL')
-    conn = psycopg2.connect(dsn)
-    cur = conn.cursor(cursor_factory=RealDictCursor)
+    action = params.get('action')
     
-    cur.execute("""
-        SELECT u.id, u.username, COALESCE(ua.activity_count, 0) as activity_count
-        FROM users u
-        LEFT JOIN user_activity ua ON u.id = ua.user_id
-        ORDER BY ua.activity_count DESC NULLS LAST
-        LIMIT 10
-    """)
-    top_users = cur.fetchall()
+    if action == 'search_users':
+        query = (params.get('q') or '').strip()
+        try:
+            limit = int(params.get('limit', '10'))
+        except ValueError:
+            limit = 0
+        
+        if not 0 < len(query) <= 100 or not 0 < limit <= USER_SEARCH_MAX_LIMIT:
+            return {
+                'statusCode': 400,
+                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                'body': json.dumps({'error': f'q must be 1-100 characters, limit 1-{USER_SEARCH_MAX_LIMIT}'}),
+                'isBase64Encoded': False
+            }
+        
+        _drain_invalidations(dsn, min_lsn)
+        return {
+            'statusCode': 200,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*', **_cache_headers()},
+            'body': json.dumps({'query': query, 'users': _search_users(dsn, query, limit)}),
+            'isBase64Encoded': False
+        }
     
-    cur.execute("""
-        SELECT p.id, p.rating, c.name as category_name, u.username
-        FROM photos p
-        JOIN categories c ON p.category_id = c.id
-        JOIN users u ON p.user_id = u.id
-        ORDER BY p.rating DESC
-        LIMIT 1
-    """)
-    top_photo = cur.fetchone()
+    if action in ('trends', 'movement'):
+        entity_type = params.get('entity', 'user')
+        try:
+            ids = [int(i) for i in params.get('ids', '').split(',') if i.strip()]
+            days = int(params.get('days', '90'))
+            top = int(params.get('top', '10'))
+        except ValueError:
+            ids, days, top = [], 0, 0
+        
+        if entity_type not in ('user', 'photo') or not 0 < days <= TREND_MAX_DAYS or not 0 < max(top, len(ids)) <= TREND_MAX_ENTITIES:
+            return {
+                'statusCode': 400,
+                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                'body': json.dumps({'error': f'entity must be user|photo, days 1-{TREND_MAX_DAYS}, up to {TREND_MAX_ENTITIES} ids/top'}),
+                'isBase64Encoded': False
+            }
+        
+        _drain_invalidations(dsn, min_lsn)
+        if action == 'trends':
+            key = ('trends', entity_type, tuple(ids), days, top)
+            result = _cached(key, {'trends'}, lambda: _load_trends(dsn, min_lsn, entity_type, ids, days, top), min_lsn=min_lsn)
+        else:
+            key = ('movement', entity_type, top)
+            result = _cached(key, {'trends'}, lambda: _load_movement(dsn, min_lsn, entity_type, top), min_lsn=min_lsn)
+        
+        return {
+            'statusCode': 200,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*', **_cache_headers()},
+            'body': json.dumps(result),
+            'isBase64Encoded': False
+        }
     
-    cur.execute("""
-        SELECT c.id, c.name, c.display_order
-        FROM categories c
-        ORDER BY c.display_order
-    """)
-    categories = cur.fetchall()
-    
-    top_photos_by_category = []
-    for category in categories:
+    def load_leaderboard():
+        conn = _connect_read(dsn, _read_lsn(min_lsn))
+        cur = conn.cursor(cursor_factory=RealDictCursor)
+        
+        cur.execute("""
+            SELECT u.id, u.username, COALESCE(ua.activity_count, 0) as activity_count
+            FROM users u
+            LEFT JOIN user_activity ua ON u.id = ua.user_id
+            ORDER BY ua.activity_count DESC NULLS LAST
+            LIMIT 10
+        """)
+        top_users = cur.fetchall()
+        
         cur.execute("""
-            SELECT p.id, p.rating, c.name as category_name, u.username
+            SELECT p.id, p.rating, p.placeholder, c.name as category_name, u.username
             FROM photos p
             JOIN categories c ON p.category_id = c.id
             JOIN users u ON p.user_id = u.id
-            WHERE p.category_id = %s
+            WHERE p.season_id = COALESCE(%s::int, (SELECT id FROM seasons WHERE is_active))
             ORDER BY p.rating DESC
             LIMIT 1
-        """, (category['id'],))
+        """, (season_id,))
+        top_photo = cur.fetchone()
         
-        top_cat_photo = cur.fetchone()
-        if top_cat_photo:
-            top_photos_by_category.append(dict(top_cat_photo))
+        cur.execute("""
+            SELECT c.id, c.name, c.display_order
+            FROM categories c
+            ORDER BY c.display_order
+        """)
+        categories = cur.fetchall()
+        
+        top_photos_by_category = []
+        for category in categories:
+            cur.execute("""
+                SELECT p.id, p.rating, p.placeholder, c.name as category_name, u.username
+                FROM photos p
+                JOIN categories c ON p.category_id = c.id
+                JOIN users u ON p.user_id = u.id
+                WHERE p.season_id = COALESCE(%s::int, (SELECT id FROM seasons WHERE is_active))
+                AND p.category_id = %s
+                ORDER BY p.rating DESC
+                LIMIT 1
+            """, (season_id, category['id']))
+            
+            top_cat_photo = cur.fetchone()
+            if top_cat_photo:
+                top_photos_by_category.append(dict(top_cat_photo))
+        
+        cur.close()
+        conn.close()
+        
+        return {
+            'top_users': [dict(u) for u in top_users],
+            'top_photo': dict(top_photo) if top_photo else None,
+            'top_photos_by_category': top_photos_by_category,
+            'categories': [dict(c) for c in categories]
+        }
+    
+    _drain_invalidations(dsn, min_lsn)
+    leaderboard = _cached(('leaderboard', season_id), {'leaderboard', 'categories', 'season'}, load_leaderboard, min_lsn=min_lsn)
+    categories = leaderboard['categories']
     
     user_activity = 0
     user_best_photo_rating = 0
@@ -88,6 +542,9 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     user_photos_by_category = {}
     
     if user_id:
+        conn = _connect_read(dsn, _read_lsn(min_lsn))
+        cur = conn.cursor(cursor_factory=RealDictCursor)
+        
         cur.execute("""
             SELECT activity_count FROM user_activity WHERE user_id = %s
         """, (user_id,))
@@ -96,8 +553,10 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             user_activity = user_act['activity_count']
         
         cur.execute("""
-            SELECT COALESCE(MAX(rating), 0) as max_rating FROM photos WHERE user_id = %s
-        """, (user_id,))
+            SELECT COALESCE(MAX(rating), 0) as max_rating
+            FROM photos
+            WHERE season_id = COALESCE(%s::int, (SELECT id FROM seasons WHERE is_active)) AND user_id = %s
+        """, (season_id, user_id))
         user_best = cur.fetchone()
         if user_best:
             user_best_photo_rating = user_best['max_rating']
@@ -115,19 +574,19 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             cur.execute("""
                 SELECT COALESCE(MAX(rating), 0) as max_rating
                 FROM photos
-                WHERE user_id = %s AND category_id = %s
-            """, (user_id, category['id']))
+                WHERE season_id = COALESCE(%s::int, (SELECT id FROM seasons WHERE is_active)) AND user_id = %s AND category_id = %s
+            """, (season_id, user_id, category['id']))
             
             cat_best = cur.fetchone()
             user_photos_by_category[category['name']] = cat_best['max_rating'] if cat_best else 0
-    
-    cur.close()
-    conn.close()
+        
+        cur.close()
+        conn.close()
     
     result = {
-        'top_users': [dict(u) for u in top_users],
-        'top_photo': dict(top_photo) if top_photo else None,
-        'top_photos_by_category': top_photos_by_category,
+        'top_users': leaderboard['top_users'],
+        'top_photo': leaderboard['top_photo'],
+        'top_photos_by_category': leaderboard['top_photos_by_category'],
         'user_stats': {
             'activity': user_activity,
             'best_photo_rating': user_best_photo_rating,
@@ -138,7 +597,7 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     
     return {
         'statusCode': 200,
-        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*', **_cache_headers()},
         'body': json.dumps(result),
         'isBase64Encoded': False
     }
\ No newline at end of file
@@ -1,14 +1,297 @@
+import base64
+import hashlib
+import io
 import json
 import os
-from typing import Dict, Any
+import re
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional, Callable, Iterable, List, Tuple
 import psycopg2
+from PIL import Image, ImageOps
+from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
 from psycopg2.extras import RealDictCursor
 
+CACHE_CHANNEL = 'cache_invalidate'
+CACHE_TTL_SECONDS = float(os.environ.get('CACHE_TTL_SECONDS', '300'))
+CACHE_MAX_ENTRIES = int(os.environ.get('CACHE_MAX_ENTRIES', '256'))
+
+_cache: 'OrderedDict[Tuple, Tuple[float, Any, frozenset, int]]' = OrderedDict()
+_cache_stats = {'hits': 0, 'misses': 0}
+_listener = None
+_drained_lsn = 0
+_invalidated_lsn = 0
+
+
+def _drain_invalidations(dsn: str, min_lsn: Optional[str] = None) -> None:
+    '''Apply pending NOTIFY invalidations; a lost listener means missed events, so flush everything.
+    A min_lsn past what was drained so far costs one round trip on the listener, after which every
+    invalidation committed up to the caller's own write has been delivered and applied'''
+    global _listener, _drained_lsn, _invalidated_lsn
+    try:
+        if _listener is None or _listener.closed:
+            _cache.clear()
+            _listener = psycopg2.connect(dsn)
+            _listener.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+            _listener.cursor().execute(f'LISTEN {CACHE_CHANNEL}')
+        _listener.poll()
+        if (_listener.notifies and REPLICA_DSNS) or _lsn_value(min_lsn) > _drained_lsn:
+            cur = _listener.cursor()
+            cur.execute('SELECT pg_current_wal_lsn()::text')
+            _drained_lsn = _lsn_value(cur.fetchone()[0])
+            cur.close()
+    except psycopg2.Error:
+        _listener = None
+        _cache.clear()
+        return
+    
+    tags = set()
+    while _listener.notifies:
+        tags.update(_listener.notifies.pop(0).payload.split(','))
+    if tags:
+        _invalidated_lsn = max(_invalidated_lsn, _drained_lsn)
+    if '*' in tags:
+        _cache.clear()
+    elif tags:
+        for key in [k for k, (_, _, t, _) in _cache.items() if t & tags]:
+            del _cache[key]
+
+
+def _read_lsn(min_lsn: Optional[str]) -> Optional[str]:
+    '''Position a read must reflect: the caller's own write, or the newest invalidation applied here, so a
+    reload after NOTIFY never caches a lagging replica's old rows again'''
+    floor = max(_lsn_value(min_lsn), _invalidated_lsn)
+    return f'{floor >> 32:X}/{floor & 0xFFFFFFFF:X}' if floor else None
+
+
+def _cached(key: Tuple, tags: Iterable[str], loader: Callable[[], Any], min_lsn: Optional[str] = None) -> Any:
+    '''Read-through TTL/LRU lookup; entries remember the LSN they were read at and are only reloaded for a
+    min_lsn that neither that LSN nor the drained invalidations cover'''
+    now = time.monotonic()
+    entry = _cache.get(key)
+    if entry and entry[0] > now and max(entry[3], _drained_lsn) >= _lsn_value(min_lsn):
+        _cache.move_to_end(key)
+        _cache_stats['hits'] += 1
+        return entry[1]
+    
+    _cache_stats['misses'] += 1
+    loaded_lsn = max(_lsn_value(min_lsn), _invalidated_lsn)
+    value = loader()
+    _cache[key] = (now + CACHE_TTL_SECONDS, value, frozenset(tags), loaded_lsn)
+    _cache.move_to_end(key)
+    while len(_cache) > CACHE_MAX_ENTRIES:
+        _cache.popitem(last=False)
+    return value
+
+
+def _cache_headers() -> Dict[str, str]:
+    total = _cache_stats['hits'] + _cache_stats['misses']
+    ratio = _cache_stats['hits'] / total if total else 0.0
+    return {
+        'X-Cache-Hits': str(_cache_stats['hits']),
+        'X-Cache-Misses': str(_cache_stats['misses']),
+        'X-Cache-Hit-Ratio': f'{ratio:.3f}'
+    }
+
+
+REPLICA_DSNS = [d.strip() for d in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if d.strip()]
+REPLICA_MAX_LAG_SECONDS = float(os.environ.get('REPLICA_MAX_LAG_SECONDS', '5'))
+REPLICA_CHECK_INTERVAL_SECONDS = float(os.environ.get('REPLICA_CHECK_INTERVAL_SECONDS', '10'))
+
+_replica_health: Dict[str, Tuple[float, bool]] = {}
+_replica_next = 0
+_LSN_PATTERN = re.compile(r'^[0-9A-F]{1,8}/[0-9A-F]{1,8}$', re.IGNORECASE)
+
+
+def _lsn_value(lsn: Optional[str]) -> int:
+    '''pg_lsn text "X/Y" as a comparable integer; request values are checked against _LSN_PATTERN first'''
+    if not lsn:
+        return 0
+    high, low = lsn.split('/')
+    return (int(high, 16) << 32) | int(low, 16)
+
+
+def _connect_read(dsn: str, min_lsn: Optional[str] = None):
+    '''Open a connection for read-only work: round-robin over caught-up replicas, primary as fallback'''
+    global _replica_next
+    now = time.monotonic()
+    for offset in range(len(REPLICA_DSNS)):
+        replica = REPLICA_DSNS[(_replica_next + offset) % len(REPLICA_DSNS)]
+        checked_at, healthy = _replica_health.get(replica, (0.0, False))
+        recently_checked = now - checked_at < REPLICA_CHECK_INTERVAL_SECONDS
+        if recently_checked and not healthy:
+            continue
+        try:
+            conn = psycopg2.connect(replica, connect_timeout=2)
+            if not recently_checked or min_lsn:
+                cur = conn.cursor()
+                cur.execute("""
+                    SELECT
+                        CASE WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+                             ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+                        END,
+                        %s::text IS NULL OR COALESCE(pg_last_wal_replay_lsn() >= %s::pg_lsn, FALSE)
+                """, (min_lsn, min_lsn))
+                lag, caught_up = cur.fetchone()
+                cur.close()
+                healthy = float(lag) <= REPLICA_MAX_LAG_SECONDS
+                _replica_health[replica] = (now, healthy)
+                if not (healthy and caught_up):
+                    conn.close()
+                    continue
+        except psycopg2.DataError:
+            conn.close()
+            break
+        except psycopg2.Error:
+            _replica_health[replica] = (now, False)
+            continue
+        _replica_next = (_replica_next + offset + 1) % len(REPLICA_DSNS)
+        return conn
+    return psycopg2.connect(dsn)
+
+
+SPRITE_TILE_SIZE = int(os.environ.get('SPRITE_TILE_SIZE', '160'))
+SPRITE_COLUMNS = int(os.environ.get('SPRITE_COLUMNS', '6'))
+SPRITE_MAX_TILES = int(os.environ.get('SPRITE_MAX_TILES', '60'))
+SPRITE_CACHE_ENTRIES = int(os.environ.get('SPRITE_CACHE_ENTRIES', '32'))
+
+_sprite_pool = ThreadPoolExecutor(max_workers=int(os.environ.get('SPRITE_WORKERS', '4')))
+_sprites: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+
+
+MAX_IMAGE_PIXELS = int(os.environ.get('MAX_IMAGE_PIXELS', str(4096 * 4096)))
+
+
+def _open_image(image_bytes: bytes) -> Image.Image:
+    '''Read only the header and refuse oversized images before any pixels are decoded'''
+    image = Image.open(io.BytesIO(image_bytes))
+    width, height = image.size
+    if width * height > MAX_IMAGE_PIXELS:
+        raise ValueError(f'Image is {width}x{height}, over the {MAX_IMAGE_PIXELS} pixel limit')
+    return image
+
+
+def _render_tile(data_url: str) -> Optional[Image.Image]:
+    try:
+        image = _open_image(base64.b64decode(data_url.split(',', 1)[-1])).convert('RGB')
+    except (ValueError, OSError, Image.DecompressionBombError):
+        return None
+    return ImageOps.fit(image, (SPRITE_TILE_SIZE, SPRITE_TILE_SIZE))
+
+
+def _render_sprite(cur, photo_ids: List[int], version: str) -> Dict[str, Any]:
+    '''Decode member thumbnails on the worker pool and paste them into one JPEG contact sheet'''
+    cur.execute(
+        "SELECT id, COALESCE(NULLIF(thumbnail_url, ''), image_url) AS data_url FROM photos WHERE id = ANY(%s)",
+        (photo_ids,)
+    )
+    sources = {row['id']: row['data_url'] for row in cur.fetchall()}
+    ordered = [photo_id for photo_id in photo_ids if photo_id in sources]
+    tiles = list(_sprite_pool.map(_render_tile, [sources[photo_id] for photo_id in ordered]))
+    
+    columns = max(1, min(SPRITE_COLUMNS, len(ordered)))
+    rows = max(1, -(-len(ordered) // columns))
+    sheet = Image.new('RGB', (columns * SPRITE_TILE_SIZE, rows * SPRITE_TILE_SIZE), (17, 17, 17))
+    coordinates = {}
+    for index, (photo_id, tile) in enumerate(zip(ordered, tiles)):
+        if tile is None:
+            continue
+        x, y = (index % columns) * SPRITE_TILE_SIZE, (index // columns) * SPRITE_TILE_SIZE
+        sheet.paste(tile, (x, y))
+        coordinates[str(photo_id)] = {'x': x, 'y': y, 'w': SPRITE_TILE_SIZE, 'h': SPRITE_TILE_SIZE}
+    
+    encoded = io.BytesIO()
+    sheet.save(encoded, 'JPEG', quality=80, optimize=True)
+    return {
+        'sprite': 'data:image/jpeg;base64,' + base64.b64encode(encoded.getvalue()).decode(),
+        'version': version,
+        'width': sheet.width,
+        'height': sheet.height,
+        'tiles': coordinates
+    }
+
+
+def _gallery_sprite(event: Dict[str, Any], params: Dict[str, Any], dsn: str, min_lsn: Optional[str]) -> Dict[str, Any]:
+    '''Contact sheet of a user's photos or a category's top-N in a season (active by default), cached by a hash of member photo versions'''
+    try:
+        user_id, category_id, season_id = (
+            int(params[name]) if params.get(name) else None for name in ('user_id', 'category_id', 'season_id')
+        )
+        limit = int(params.get('limit') or SPRITE_MAX_TILES)
+    except ValueError:
+        limit = 0
+    
+    if not 0 < limit <= SPRITE_MAX_TILES:
+        return {
+            'statusCode': 400,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({'error': f'user_id, category_id and season_id must be integers, limit 1-{SPRITE_MAX_TILES}'}),
+            'isBase64Encoded': False
+        }
+    
+    conn = _connect_read(dsn, _read_lsn(min_lsn))
+    cur = conn.cursor(cursor_factory=RealDictCursor)
+    version_sql = "COALESCE(p.content_hash, md5(COALESCE(NULLIF(p.thumbnail_url, ''), p.image_url))) AS version"
+    if user_id:
+        cur.execute(f"""
+            SELECT p.id, p.season_id, {version_sql}
+            FROM photos p
+            JOIN categories c ON p.category_id = c.id
+            WHERE p.season_id = COALESCE(%s::int, (SELECT id FROM seasons WHERE is_active))
+            AND p.user_id = %s
+            ORDER BY c.display_order, p.created_at
+            LIMIT %s
+        """, (season_id, user_id, limit))
+    else:
+        cur.execute(f"""
+            SELECT p.id, p.season_id, {version_sql}
+            FROM photos p
+            WHERE p.season_id = COALESCE(%s::int, (SELECT id FROM seasons WHERE is_active))
+            AND p.category_id = %s
+            ORDER BY p.rating DESC, p.id
+            LIMIT %s
+        """, (season_id, category_id, limit))
+    members = cur.fetchall()
+    
+    version = hashlib.sha256(
+        f'{SPRITE_TILE_SIZE}:{SPRITE_COLUMNS}|'.encode() +
+        '|'.join(f"{row['season_id']}:{row['id']}:{row['version']}" for row in members).encode()
+    ).hexdigest()[:32]
+    etag = f'"{version}"'
+    headers = {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*', 'ETag': etag}
+    
+    request_headers = {k.lower(): v for k, v in (event.get('headers') or {}).items()}
+    if request_headers.get('if-none-match') == etag:
+        cur.close()
+        conn.close()
+        return {'statusCode': 304, 'headers': headers, 'body': '', 'isBase64Encoded': False}
+    
+    sprite = _sprites.get(version)
+    if sprite:
+        _sprites.move_to_end(version)
+    else:
+        sprite = _render_sprite(cur, [row['id'] for row in members], version)
+        _sprites[version] = sprite
+        while len(_sprites) > SPRITE_CACHE_ENTRIES:
+            _sprites.popitem(last=False)
+    
+    cur.close()
+    conn.close()
+    
+    return {
+        'statusCode': 200,
+        'headers': headers,
+        'body': json.dumps(sprite),
+        'isBase64Encoded': False
+    }
+
+
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     '''
-    Business: Get thumbnail image by photo ID
-    Args: event with httpMethod GET, query param photo_id
-    Returns: HTTP response with thumbnail_url
+    Business: Get thumbnail image by photo ID, or a contact-sheet sprite of a user's or category's thumbnails
+    Args: event with httpMethod GET, query params photo_id | user_id | category_id (+ limit, season_id; active season by default)
+    Returns: HTTP response with thumbnail_url, or sprite data URL with per-photo tile coordinates
     '''
     method: str = event.get('httpMethod', 'GET')
     
@@ -18,7 +301,7 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             'headers': {
                 'Access-Control-Allow-Origin': '*',
                 'Access-Control-Allow-Methods': 'GET, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type',
+                'Access-Control-Allow-Headers': 'Content-Type, If-None-Match',
                 'Access-Control-Max-Age': '86400'
             },
             'body': '',
@@ -35,24 +318,40 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     
     params = event.get('queryStringParameters', {})
     photo_id = params.get('photo_id')
+    min_lsn = params.get('min_lsn')
     
-    if not photo_id:
+    if min_lsn and not _LSN_PATTERN.match(min_lsn):
         return {
             'statusCode': 400,
             'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'photo_id parameter required'}),
+            'body': json.dumps({'error': 'Invalid min_lsn'}),
             'isBase64Encoded': False
         }
     
     dsn = os.environ.get('DATABASE_URL')
-    conn = psycopg2.connect(dsn)
-    cur = conn.cursor(cursor_factory=RealDictCursor)
     
-    cur.execute("SELECT thumbnail_url, image_url FROM photos WHERE id = %s", (photo_id,))
-    result = cur.fetchone()
+    if not photo_id and (params.get('user_id') or params.get('category_id')):
+        return _gallery_sprite(event, params, dsn, min_lsn)
     
-    cur.close()
-    conn.close()
+    if not photo_id:
+        return {
+            'statusCode': 400,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({'error': 'photo_id, user_id or category_id parameter required'}),
+            'isBase64Encoded': False
+        }
+    
+    def load_thumbnail():
+        conn = _connect_read(dsn, _read_lsn(min_lsn))
+        cur = conn.cursor(cursor_factory=RealDictCursor)
+        cur.execute("SELECT thumbnail_url, image_url FROM photos WHERE id = %s", (photo_id,))
+        row = cur.fetchone()
+        cur.close()
+        conn.close()
+        return dict(row) if row else None
+    
+    _drain_invalidations(dsn, min_lsn)
+    result = _cached(('thumbnail', str(photo_id)), {f'photo_content:{photo_id}'}, load_thumbnail, min_lsn=min_lsn)
     
     if not result:
         return {
@@ -66,7 +365,7 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     
     return {
         'statusCode': 200,
-        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*', **_cache_headers()},
         'body': json.dumps({'thumbnail_url': thumbnail}),
         'isBase64Encoded': False
     }
\ No newline at end of file
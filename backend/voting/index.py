@@ -1,17 +1,351 @@
+import base64
+import hashlib
+import hmac
 import json
+import math
 import os
 import random
-from typing import Dict, Any, Optional
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Callable, Iterable, Tuple
 import psycopg2
+from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
 from psycopg2.extras import RealDictCursor
 
+CACHE_CHANNEL = 'cache_invalidate'
+CACHE_TTL_SECONDS = float(os.environ.get('CACHE_TTL_SECONDS', '300'))
+CACHE_MAX_ENTRIES = int(os.environ.get('CACHE_MAX_ENTRIES', '64'))
+
+_cache: 'OrderedDict[Tuple, Tuple[float, Any, frozenset, int]]' = OrderedDict()
+_cache_stats = {'hits': 0, 'misses': 0}
+_listener = None
+_drained_lsn = 0
+_invalidated_lsn = 0
+
+
+def _drain_invalidations(dsn: str, min_lsn: Optional[str] = None) -> None:
+    '''Apply pending NOTIFY invalidations; a lost listener means missed events, so flush everything.
+    A min_lsn past what was drained so far costs one round trip on the listener, after which every
+    invalidation committed up to the caller's own write has been delivered and applied'''
+    global _listener, _drained_lsn, _invalidated_lsn
+    try:
+        if _listener is None or _listener.closed:
+            _cache.clear()
+            _listener = psycopg2.connect(dsn)
+            _listener.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+            _listener.cursor().execute(f'LISTEN {CACHE_CHANNEL}')
+        _listener.poll()
+        if (_listener.notifies and REPLICA_DSNS) or _lsn_value(min_lsn) > _drained_lsn:
+            cur = _listener.cursor()
+            cur.execute('SELECT pg_current_wal_lsn()::text')
+            _drained_lsn = _lsn_value(cur.fetchone()[0])
+            cur.close()
+    except psycopg2.Error:
+        _listener = None
+        _cache.clear()
+        return
+    
+    tags = set()
+    while _listener.notifies:
+        tags.update(_listener.notifies.pop(0).payload.split(','))
+    if tags:
+        _invalidated_lsn = max(_invalidated_lsn, _drained_lsn)
+    if '*' in tags:
+        _cache.clear()
+    elif tags:
+        for key in [k for k, (_, _, t, _) in _cache.items() if t & tags]:
+            del _cache[key]
+
+
+def _read_lsn(min_lsn: Optional[str]) -> Optional[str]:
+    '''Position a read must reflect: the caller's own write, or the newest invalidation applied here, so a
+    reload after NOTIFY never caches a lagging replica's old rows again'''
+    floor = max(_lsn_value(min_lsn), _invalidated_lsn)
+    return f'{floor >> 32:X}/{floor & 0xFFFFFFFF:X}' if floor else None
+
+
+def _cached(key: Tuple, tags: Iterable[str], loader: Callable[[], Any], min_lsn: Optional[str] = None) -> Any:
+    '''Read-through TTL/LRU lookup; entries remember the LSN they were read at and are only reloaded for a
+    min_lsn that neither that LSN nor the drained invalidations cover'''
+    now = time.monotonic()
+    entry = _cache.get(key)
+    if entry and entry[0] > now and max(entry[3], _drained_lsn) >= _lsn_value(min_lsn):
+        _cache.move_to_end(key)
+        _cache_stats['hits'] += 1
+        return entry[1]
+    
+    _cache_stats['misses'] += 1
+    loaded_lsn = max(_lsn_value(min_lsn), _invalidated_lsn)
+    value = loader()
+    _cache[key] = (now + CACHE_TTL_SECONDS, value, frozenset(tags), loaded_lsn)
+    _cache.move_to_end(key)
+    while len(_cache) > CACHE_MAX_ENTRIES:
+        _cache.popitem(last=False)
+    return value
+
+
+def _cache_headers() -> Dict[str, str]:
+    total = _cache_stats['hits'] + _cache_stats['misses']
+    ratio = _cache_stats['hits'] / total if total else 0.0
+    return {
+        'X-Cache-Hits': str(_cache_stats['hits']),
+        'X-Cache-Misses': str(_cache_stats['misses']),
+        'X-Cache-Hit-Ratio': f'{ratio:.3f}'
+    }
+
+
+REPLICA_DSNS = [d.strip() for d in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if d.strip()]
+REPLICA_MAX_LAG_SECONDS = float(os.environ.get('REPLICA_MAX_LAG_SECONDS', '5'))
+REPLICA_CHECK_INTERVAL_SECONDS = float(os.environ.get('REPLICA_CHECK_INTERVAL_SECONDS', '10'))
+
+_replica_health: Dict[str, Tuple[float, bool]] = {}
+_replica_next = 0
+_LSN_PATTERN = re.compile(r'^[0-9A-F]{1,8}/[0-9A-F]{1,8}$', re.IGNORECASE)
+
+
+def _lsn_value(lsn: Optional[str]) -> int:
+    '''pg_lsn text "X/Y" as a comparable integer; request values are checked against _LSN_PATTERN first'''
+    if not lsn:
+        return 0
+    high, low = lsn.split('/')
+    return (int(high, 16) << 32) | int(low, 16)
+
+
+def _connect_read(dsn: str, min_lsn: Optional[str] = None):
+    '''Open a connection for read-only work: round-robin over caught-up replicas, primary as fallback'''
+    global _replica_next
+    now = time.monotonic()
+    for offset in range(len(REPLICA_DSNS)):
+        replica = REPLICA_DSNS[(_replica_next + offset) % len(REPLICA_DSNS)]
+        checked_at, healthy = _replica_health.get(replica, (0.0, False))
+        recently_checked = now - checked_at < REPLICA_CHECK_INTERVAL_SECONDS
+        if recently_checked and not healthy:
+            continue
+        try:
+            conn = psycopg2.connect(replica, connect_timeout=2)
+            if not recently_checked or min_lsn:
+                cur = conn.cursor()
+                cur.execute("""
+                    SELECT
+                        CASE WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+                             ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+                        END,
+                        %s::text IS NULL OR COALESCE(pg_last_wal_replay_lsn() >= %s::pg_lsn, FALSE)
+                """, (min_lsn, min_lsn))
+                lag, caught_up = cur.fetchone()
+                cur.close()
+                healthy = float(lag) <= REPLICA_MAX_LAG_SECONDS
+                _replica_health[replica] = (now, healthy)
+                if not (healthy and caught_up):
+                    conn.close()
+                    continue
+        except psycopg2.DataError:
+            conn.close()
+            break
+        except psycopg2.Error:
+            _replica_health[replica] = (now, False)
+            continue
+        _replica_next = (_replica_next + offset + 1) % len(REPLICA_DSNS)
+        return conn
+    return psycopg2.connect(dsn)
+
+
+SESSION_SECRET = os.environ.get('SESSION_SECRET', '')
+
+
+def _session_user_id(event: Dict[str, Any]) -> Optional[int]:
+    '''User id from a valid, unexpired X-Session-Token issued by auth; checked in-process, no DB lookup'''
+    headers = {k.lower(): v for k, v in (event.get('headers') or {}).items()}
+    parts = (headers.get('x-session-token') or '').split('.')
+    if not SESSION_SECRET or len(parts) != 3:
+        return None
+    
+    user_id, expires_at, signature = parts
+    expected = base64.urlsafe_b64encode(
+        hmac.new(SESSION_SECRET.encode(), f'{user_id}.{expires_at}'.encode(), hashlib.sha256).digest()
+    ).rstrip(b'=').decode()
+    if not hmac.compare_digest(signature.encode(errors='ignore'), expected.encode()):
+        return None
+    if not user_id.isdigit() or not expires_at.isdigit() or int(expires_at) < time.time():
+        return None
+    return int(user_id)
+
+
+RATE_LIMIT_SCOPE = 'vote'
+RATE_LIMIT_BACKEND = os.environ.get('RATE_LIMIT_BACKEND', 'memory')
+RATE_LIMIT_MAX_KEYS = int(os.environ.get('RATE_LIMIT_MAX_KEYS', '10000'))
+RATE_LIMITS = {
+    'user': (float(os.environ.get('RATE_LIMIT_USER_PER_SECOND', '1')), float(os.environ.get('RATE_LIMIT_USER_BURST', '10'))),
+    'ip': (float(os.environ.get('RATE_LIMIT_IP_PER_SECOND', '5')), float(os.environ.get('RATE_LIMIT_IP_BURST', '50'))),
+}
+DB_MAX_CONCURRENCY = int(os.environ.get('DB_MAX_CONCURRENCY', '20'))
+DB_SLOT_WAIT_SECONDS = float(os.environ.get('DB_SLOT_WAIT_SECONDS', '0.5'))
+DB_SLOT_LOCK_CLASS = 7301
+
+_buckets: 'OrderedDict[str, Tuple[float, float]]' = OrderedDict()
+_buckets_lock = threading.Lock()
+_limiter_conn = None
+
+
+def _client_ip(event: Dict[str, Any]) -> Optional[str]:
+    source_ip = ((event.get('requestContext') or {}).get('identity') or {}).get('sourceIp')
+    if source_ip:
+        return source_ip
+    headers = {k.lower(): v for k, v in (event.get('headers') or {}).items()}
+    return (headers.get('x-forwarded-for') or '').split(',')[0].strip() or None
+
+
+def _take_local(key: str, rate: float, burst: float) -> float:
+    '''Token bucket in this container; returns 0 when a token was taken, otherwise seconds until the next one'''
+    now = time.monotonic()
+    with _buckets_lock:
+        tokens, updated_at = _buckets.pop(key, (burst, now))
+        tokens = min(burst, tokens + (now - updated_at) * rate)
+        wait = 0.0 if tokens >= 1 else (1 - tokens) / rate
+        _buckets[key] = (tokens - 1 if wait == 0 else tokens, now)
+        while len(_buckets) > RATE_LIMIT_MAX_KEYS:
+            _buckets.popitem(last=False)
+    return wait
+
+
+def _limiter_connection(dsn: str):
+    '''One autocommit connection per warm container for shared buckets and write slots, reused across requests'''
+    global _limiter_conn
+    if _limiter_conn is None or _limiter_conn.closed:
+        _limiter_conn = psycopg2.connect(dsn, connect_timeout=2)
+        _limiter_conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+    return _limiter_conn
+
+
+def _take_shared(dsn: str, key: str, rate: float, burst: float) -> float:
+    '''Same bucket kept in the unlogged rate_limit_buckets table so every container draws from it'''
+    cur = _limiter_connection(dsn).cursor()
+    cur.execute("""
+        INSERT INTO rate_limit_buckets AS b (bucket_key, tokens, updated_at)
+        VALUES (%(key)s, %(burst)s - 1, now())
+        ON CONFLICT (bucket_key) DO UPDATE SET
+            tokens = LEAST(%(burst)s, b.tokens + EXTRACT(EPOCH FROM now() - b.updated_at) * %(rate)s) - 1,
+            updated_at = now()
+        WHERE LEAST(%(burst)s, b.tokens + EXTRACT(EPOCH FROM now() - b.updated_at) * %(rate)s) >= 1
+        RETURNING tokens
+    """, {'key': key, 'burst': burst, 'rate': rate})
+    if cur.fetchone():
+        cur.close()
+        return 0.0
+    
+    cur.execute("""
+        SELECT LEAST(%s, tokens + EXTRACT(EPOCH FROM now() - updated_at) * %s) FROM rate_limit_buckets WHERE bucket_key = %s
+    """, (burst, rate, key))
+    tokens = float(cur.fetchone()[0])
+    cur.close()
+    return max((1 - tokens) / rate, 0.0)
+
+
+def _rate_limited(event: Dict[str, Any], dsn: str) -> Optional[Dict[str, Any]]:
+    '''429 with Retry-After once the caller's IP or session user runs out of tokens, else None'''
+    global _limiter_conn
+    for kind, subject in (('ip', _client_ip(event)), ('user', _session_user_id(event))):
+        if subject is None:
+            continue
+        rate, burst = RATE_LIMITS[kind]
+        key = f'{RATE_LIMIT_SCOPE}:{kind}:{subject}'
+        wait = None
+        if RATE_LIMIT_BACKEND == 'postgres':
+            try:
+                wait = _take_shared(dsn, key, rate, burst)
+            except psycopg2.Error:
+                _limiter_conn = None
+        if wait is None:
+            wait = _take_local(key, rate, burst)
+        if wait > 0:
+            return {
+                'statusCode': 429,
+                'headers': {
+                    'Content-Type': 'application/json',
+                    'Access-Control-Allow-Origin': '*',
+                    'Retry-After': str(math.ceil(wait))
+                },
+                'body': json.dumps({'error': 'Too many requests, slow down'}),
+                'isBase64Encoded': False
+            }
+    return None
+
+
+def _acquire_db_slot(dsn: str) -> Optional[int]:
+    '''Take one of DB_MAX_CONCURRENCY cluster-wide write slots, held as a session advisory lock that voting and
+    photos share; None when every slot stays taken for DB_SLOT_WAIT_SECONDS or the database is unreachable'''
+    global _limiter_conn
+    deadline = time.monotonic() + DB_SLOT_WAIT_SECONDS
+    offset = random.randrange(DB_MAX_CONCURRENCY)
+    while True:
+        try:
+            cur = _limiter_connection(dsn).cursor()
+            cur.execute("""
+                SELECT slot FROM (SELECT (s + %s) %% %s AS slot FROM generate_series(0, %s - 1) s) slots
+                WHERE pg_try_advisory_lock(%s, slot)
+                LIMIT 1
+            """, (offset, DB_MAX_CONCURRENCY, DB_MAX_CONCURRENCY, DB_SLOT_LOCK_CLASS))
+            row = cur.fetchone()
+            cur.close()
+        except psycopg2.Error:
+            _limiter_conn = None
+            return None
+        if row:
+            return row[0]
+        if time.monotonic() >= deadline:
+            return None
+        time.sleep(0.05)
+
+
+def _release_db_slot(slot: int) -> None:
+    global _limiter_conn
+    try:
+        cur = _limiter_conn.cursor()
+        cur.execute("SELECT pg_advisory_unlock(%s, %s)", (DB_SLOT_LOCK_CLASS, slot))
+        cur.close()
+    except psycopg2.Error:
+        _limiter_conn.close()
+        _limiter_conn = None
+
+
+def _overloaded_response() -> Dict[str, Any]:
+    return {
+        'statusCode': 503,
+        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*', 'Retry-After': '1'},
+        'body': json.dumps({'error': 'Server is busy, try again shortly'}),
+        'isBase64Encoded': False
+    }
+
+
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     '''
-    Business: Get random photo pairs for voting and submit votes
+    Business: Get scheduled (or least-viewed) photo pairs for voting and submit votes
     Args: event with httpMethod, body (user_id, winner_photo_id for POST), query params (user_id for GET)
     Returns: HTTP response with photo pair or vote result
     '''
     method: str = event.get('httpMethod', 'GET')
+    if method in ('GET', 'OPTIONS'):
+        return _handle(event)
+    
+    dsn = os.environ.get('DATABASE_URL')
+    if method == 'POST':
+        limited = _rate_limited(event, dsn)
+        if limited:
+            return limited
+    
+    slot = _acquire_db_slot(dsn)
+    if slot is None:
+        return _overloaded_response()
+    try:
+        return _handle(event)
+    finally:
+        _release_db_slot(slot)
+
+
+def _handle(event: Dict[str, Any]) -> Dict[str, Any]:
+    method: str = event.get('httpMethod', 'GET')
     
     if method == 'OPTIONS':
         return {
@@ -19,7 +353,7 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             'headers': {
                 'Access-Control-Allow-Origin': '*',
                 'Access-Control-Allow-Methods': 'GET, POST, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type, X-User-Id',
+                'Access-Control-Allow-Headers': 'Content-Type, X-User-Id, X-Session-Token',
                 'Access-Control-Max-Age': '86400'
             },
             'body': '',
@@ -27,7 +361,20 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         }
     
     dsn = os.environ.get('DATABASE_URL')
-    conn = psycopg2.connect(dsn)
+    if method == 'GET':
+        min_lsn = (event.get('queryStringParameters') or {}).get('min_lsn')
+        if min_lsn and not _LSN_PATTERN.match(min_lsn):
+            return {
+                'statusCode': 400,
+                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                'body': json.dumps({'error': 'Invalid min_lsn'}),
+                'isBase64Encoded': False
+            }
+        
+        _drain_invalidations(dsn, min_lsn)
+        conn = _connect_read(dsn, _read_lsn(min_lsn))
+    else:
+        conn = psycopg2.connect(dsn)
     cur = conn.cursor(cursor_factory=RealDictCursor)
     
     if method == 'GET':
@@ -44,24 +391,67 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                 'isBase64Encoded': False
             }
         
-        cur.execute("""
-            SELECT c.id, c.name FROM categories c ORDER BY c.display_order
-        """)
-        categories = cur.fetchall()
+        def load_categories():
+            cur.execute("""
+                SELECT c.id, c.name FROM categories c ORDER BY c.display_order
+            """)
+            return [dict(row) for row in cur.fetchall()]
+        
+        def load_active_season():
+            cur.execute("SELECT id FROM seasons WHERE is_active")
+            row = cur.fetchone()
+            return row['id'] if row else None
+        
+        categories = _cached(('categories',), {'categories'}, load_categories, min_lsn=min_lsn)
+        season_id = _cached(('active_season',), {'season'}, load_active_season, min_lsn=min_lsn)
         
         photo_pair: Optional[tuple] = None
         selected_category = None
         
         for category in categories:
             cur.execute("""
-                SELECT p.id, p.rating, p.views_count
+                SELECT p1.id AS photo1_id, p1.rating AS photo1_rating, p1.views_count AS photo1_views_count,
+                       p1.placeholder AS photo1_placeholder,
+                       p2.id AS photo2_id, p2.rating AS photo2_rating, p2.views_count AS photo2_views_count,
+                       p2.placeholder AS photo2_placeholder
+                FROM matchup_queue q
+                JOIN photos p1 ON p1.id = q.photo1_id
+                JOIN photos p2 ON p2.id = q.photo2_id
+                WHERE q.category_id = %s
+                AND p1.season_id = %s AND p2.season_id = %s
+                AND p1.user_id != %s AND p2.user_id != %s
+                AND NOT EXISTS (
+                    SELECT 1 FROM shown_photos s
+                    WHERE s.season_id = %s AND s.user_id = %s AND s.photo_id IN (q.photo1_id, q.photo2_id)
+                )
+                ORDER BY q.priority, q.id
+                LIMIT 1
+            """, (category['id'], season_id, season_id, user_id, user_id, season_id, user_id))
+            
+            scheduled = cur.fetchone()
+            if scheduled:
+                photo_pair = tuple(
+                    {
+                        'id': scheduled[f'{side}_id'],
+                        'rating': scheduled[f'{side}_rating'],
+                        'views_count': scheduled[f'{side}_views_count'],
+                        'placeholder': scheduled[f'{side}_placeholder']
+                    }
+                    for side in ('photo1', 'photo2')
+                )
+                selected_category = category
+                break
+            
+            cur.execute("""
+                SELECT p.id, p.rating, p.views_count, p.placeholder
                 FROM photos p
-                WHERE p.category_id = %s
+                WHERE p.season_id = %s
+                AND p.category_id = %s
                 AND p.user_id != %s
-                AND p.id NOT IN (SELECT photo_id FROM shown_photos WHERE user_id = %s)
+                AND p.id NOT IN (SELECT photo_id FROM shown_photos WHERE season_id = %s AND user_id = %s)
                 ORDER BY p.views_count ASC, RANDOM()
                 LIMIT 2
-            """, (category['id'], user_id, user_id))
+            """, (season_id, category['id'], user_id, season_id, user_id))
             
             photos = cur.fetchall()
             if len(photos) >= 2:
@@ -74,7 +464,7 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             conn.close()
             return {
                 'statusCode': 200,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*', **_cache_headers()},
                 'body': json.dumps({'completed': True, 'message': 'All photos voted'}),
                 'isBase64Encoded': False
             }
@@ -84,7 +474,7 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         
         return {
             'statusCode': 200,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*', **_cache_headers()},
             'body': json.dumps({
                 'photo1': dict(photo_pair[0]),
                 'photo2': dict(photo_pair[1]),
@@ -110,33 +500,75 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                 'isBase64Encoded': False
             }
         
+        session_user_id = _session_user_id(event)
+        if session_user_id is None or str(session_user_id) != str(user_id):
+            cur.close()
+            conn.close()
+            return {
+                'statusCode': 401 if session_user_id is None else 403,
+                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                'body': json.dumps({'error': 'Invalid or expired session' if session_user_id is None else 'Session does not match user_id'}),
+                'isBase64Encoded': False
+            }
+        
+        cur.execute("""
+            INSERT INTO votes (season_id, user_id, photo1_id, photo2_id, winner_photo_id)
+            SELECT p.season_id, %s, %s, %s, %s FROM photos p WHERE p.id = %s
+            RETURNING season_id
+        """, (user_id, photo1_id, photo2_id, winner_photo_id, winner_photo_id))
+        vote = cur.fetchone()
+        
+        if not vote:
+            conn.rollback()
+            cur.close()
+            conn.close()
+            return {
+                'statusCode': 404,
+                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                'body': json.dumps({'error': 'Photo not found'}),
+                'isBase64Encoded': False
+            }
+        
+        season_id = vote['season_id']
+        
         cur.execute(
-            "INSERT INTO votes (user_id, photo1_id, photo2_id, winner_photo_id) VALUES (%s, %s, %s, %s)",
-            (user_id, photo1_id, photo2_id, winner_photo_id)
+            "UPDATE photos SET rating = rating + 1 WHERE season_id = %s AND id = %s RETURNING user_id",
+            (season_id, winner_photo_id)
         )
-        
-        cur.execute("UPDATE photos SET rating = rating + 1 WHERE id = %s", (winner_photo_id,))
+        winner = cur.fetchone()
         
         cur.execute(
-            "INSERT INTO shown_photos (user_id, photo_id) VALUES (%s, %s), (%s, %s) ON CONFLICT DO NOTHING",
-            (user_id, photo1_id, user_id, photo2_id)
+            "INSERT INTO shown_photos (season_id, user_id, photo_id) VALUES (%s, %s, %s), (%s, %s, %s) ON CONFLICT DO NOTHING",
+            (season_id, user_id, photo1_id, season_id, user_id, photo2_id)
         )
         
-        cur.execute("UPDATE photos SET views_count = views_count + 1 WHERE id IN (%s, %s)", (photo1_id, photo2_id))
+        cur.execute(
+            "UPDATE photos SET views_count = views_count + 1 WHERE season_id = %s AND id IN (%s, %s)",
+            (season_id, photo1_id, photo2_id)
+        )
         
         cur.execute(
             "UPDATE user_activity SET activity_count = activity_count + 1 WHERE user_id = %s",
             (user_id,)
         )
         
+        tags = ['leaderboard']
+        if winner:
+            tags.append(f'user:{winner["user_id"]}')
+        cur.execute("SELECT pg_notify(%s, %s)", (CACHE_CHANNEL, ','.join(tags)))
+        
         conn.commit()
+        write_lsn = None
+        if REPLICA_DSNS:
+            cur.execute("SELECT pg_current_wal_lsn()::text AS lsn")
+            write_lsn = cur.fetchone()['lsn']
         cur.close()
         conn.close()
         
         return {
             'statusCode': 200,
             'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'message': 'Vote recorded successfully'}),
+            'body': json.dumps({'message': 'Vote recorded successfully', 'lsn': write_lsn}),
             'isBase64Encoded': False
         }
     
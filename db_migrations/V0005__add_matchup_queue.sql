@@ -0,0 +1,15 @@
+-- Precomputed Swiss-style matchups per category, rebuilt by maintenance?action=schedule_matchups.
+-- photo1_id < photo2_id; priority orders pairs by rating gap, then by how little the pair has been seen.
+CREATE TABLE IF NOT EXISTS matchup_queue (
+    id BIGSERIAL PRIMARY KEY,
+    category_id INTEGER NOT NULL REFERENCES categories(id),
+    photo1_id INTEGER NOT NULL,
+    photo2_id INTEGER NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE(category_id, photo1_id, photo2_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_matchup_queue_next ON matchup_queue(category_id, priority, id);
+CREATE INDEX IF NOT EXISTS idx_matchup_queue_photo1 ON matchup_queue(photo1_id);
+CREATE INDEX IF NOT EXISTS idx_matchup_queue_photo2 ON matchup_queue(photo2_id);
@@ -0,0 +1,7 @@
+-- Exact (SHA-256) and perceptual (64-bit dHash) hashes for duplicate detection on upload
+ALTER TABLE photos ADD COLUMN IF NOT EXISTS content_hash CHAR(64);
+ALTER TABLE photos ADD COLUMN IF NOT EXISTS phash BIGINT;
+ALTER TABLE photos ADD COLUMN IF NOT EXISTS duplicate_of INTEGER;
+
+CREATE INDEX IF NOT EXISTS idx_photos_content_hash ON photos(content_hash);
+CREATE INDEX IF NOT EXISTS idx_photos_missing_phash ON photos(id) WHERE phash IS NULL;
@@ -0,0 +1,4 @@
+-- Blurhash placeholder computed at upload and inlined into list responses
+ALTER TABLE photos ADD COLUMN IF NOT EXISTS placeholder VARCHAR(64);
+
+CREATE INDEX IF NOT EXISTS idx_photos_missing_placeholder ON photos(id) WHERE placeholder IS NULL;
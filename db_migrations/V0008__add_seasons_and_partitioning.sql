@@ -0,0 +1,115 @@
+-- Contest seasons. photos, votes and shown_photos become LIST-partitioned by season_id,
+-- one partition per season (photos_s<id>, votes_s<id>, shown_photos_s<id>).
+-- maintenance?action=start_season creates partitions, action=archive_season detaches them.
+CREATE TABLE IF NOT EXISTS seasons (
+    id SERIAL PRIMARY KEY,
+    name VARCHAR(100) NOT NULL,
+    started_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    ended_at TIMESTAMP,
+    archived_at TIMESTAMP,
+    is_active BOOLEAN NOT NULL DEFAULT FALSE
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_seasons_single_active ON seasons(is_active) WHERE is_active;
+
+INSERT INTO seasons (id, name, is_active) VALUES (1, 'Сезон 1', TRUE) ON CONFLICT (id) DO NOTHING;
+SELECT setval('seasons_id_seq', (SELECT MAX(id) FROM seasons));
+
+-- Partitioned tables cannot be referenced by single-column foreign keys; photo references are
+-- already cleaned up by the photos DELETE handler.
+ALTER TABLE votes DROP CONSTRAINT IF EXISTS votes_photo1_id_fkey;
+ALTER TABLE votes DROP CONSTRAINT IF EXISTS votes_photo2_id_fkey;
+ALTER TABLE votes DROP CONSTRAINT IF EXISTS votes_winner_photo_id_fkey;
+ALTER TABLE shown_photos DROP CONSTRAINT IF EXISTS shown_photos_photo_id_fkey;
+ALTER TABLE daily_stats DROP CONSTRAINT IF EXISTS daily_stats_photo_id_fkey;
+
+-- photos
+ALTER SEQUENCE photos_id_seq OWNED BY NONE;
+
+CREATE TABLE photos_partitioned (
+    id INTEGER NOT NULL DEFAULT nextval('photos_id_seq'),
+    season_id INTEGER NOT NULL REFERENCES seasons(id),
+    user_id INTEGER NOT NULL REFERENCES users(id),
+    category_id INTEGER NOT NULL REFERENCES categories(id),
+    image_url TEXT NOT NULL,
+    rating INTEGER DEFAULT 0,
+    views_count INTEGER DEFAULT 0,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    thumbnail_url TEXT,
+    content_hash CHAR(64),
+    phash BIGINT,
+    duplicate_of INTEGER,
+    placeholder VARCHAR(64),
+    PRIMARY KEY (season_id, id)
+) PARTITION BY LIST (season_id);
+
+CREATE TABLE photos_s1 PARTITION OF photos_partitioned FOR VALUES IN (1);
+
+INSERT INTO photos_partitioned (
+    id, season_id, user_id, category_id, image_url, rating, views_count, created_at,
+    thumbnail_url, content_hash, phash, duplicate_of, placeholder
+)
+SELECT id, 1, user_id, category_id, image_url, rating, views_count, created_at,
+       thumbnail_url, content_hash, phash, duplicate_of, placeholder
+FROM photos;
+
+DROP TABLE photos;
+ALTER TABLE photos_partitioned RENAME TO photos;
+ALTER INDEX photos_partitioned_pkey RENAME TO photos_pkey;
+ALTER SEQUENCE photos_id_seq OWNED BY photos.id;
+
+CREATE INDEX IF NOT EXISTS idx_photos_id ON photos(id);
+CREATE INDEX IF NOT EXISTS idx_photos_category ON photos(season_id, category_id);
+CREATE INDEX IF NOT EXISTS idx_photos_user ON photos(season_id, user_id);
+CREATE INDEX IF NOT EXISTS idx_photos_rating ON photos(season_id, rating DESC);
+CREATE INDEX IF NOT EXISTS idx_photos_content_hash ON photos(content_hash);
+CREATE INDEX IF NOT EXISTS idx_photos_missing_phash ON photos(id) WHERE phash IS NULL;
+CREATE INDEX IF NOT EXISTS idx_photos_missing_placeholder ON photos(id) WHERE placeholder IS NULL;
+
+-- votes
+ALTER SEQUENCE votes_id_seq OWNED BY NONE;
+
+CREATE TABLE votes_partitioned (
+    id INTEGER NOT NULL DEFAULT nextval('votes_id_seq'),
+    season_id INTEGER NOT NULL REFERENCES seasons(id),
+    user_id INTEGER NOT NULL REFERENCES users(id),
+    photo1_id INTEGER NOT NULL,
+    photo2_id INTEGER NOT NULL,
+    winner_photo_id INTEGER NOT NULL,
+    voted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (season_id, id),
+    UNIQUE (season_id, user_id, photo1_id, photo2_id)
+) PARTITION BY LIST (season_id);
+
+CREATE TABLE votes_s1 PARTITION OF votes_partitioned FOR VALUES IN (1);
+
+INSERT INTO votes_partitioned (id, season_id, user_id, photo1_id, photo2_id, winner_photo_id, voted_at)
+SELECT id, 1, user_id, photo1_id, photo2_id, winner_photo_id, voted_at FROM votes;
+
+DROP TABLE votes;
+ALTER TABLE votes_partitioned RENAME TO votes;
+ALTER INDEX votes_partitioned_pkey RENAME TO votes_pkey;
+ALTER SEQUENCE votes_id_seq OWNED BY votes.id;
+
+CREATE INDEX IF NOT EXISTS idx_votes_user ON votes(user_id);
+CREATE INDEX IF NOT EXISTS idx_votes_winner ON votes(winner_photo_id);
+
+-- shown_photos
+CREATE TABLE shown_photos_partitioned (
+    season_id INTEGER NOT NULL REFERENCES seasons(id),
+    user_id INTEGER NOT NULL REFERENCES users(id),
+    photo_id INTEGER NOT NULL,
+    shown_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (season_id, user_id, photo_id)
+) PARTITION BY LIST (season_id);
+
+CREATE TABLE shown_photos_s1 PARTITION OF shown_photos_partitioned FOR VALUES IN (1);
+
+INSERT INTO shown_photos_partitioned (season_id, user_id, photo_id, shown_at)
+SELECT 1, user_id, photo_id, shown_at FROM shown_photos;
+
+DROP TABLE shown_photos;
+ALTER TABLE shown_photos_partitioned RENAME TO shown_photos;
+ALTER INDEX shown_photos_partitioned_pkey RENAME TO shown_photos_pkey;
+
+CREATE INDEX IF NOT EXISTS idx_shown_photos_photo ON shown_photos(photo_id);
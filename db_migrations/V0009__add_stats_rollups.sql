@@ -0,0 +1,16 @@
+-- Downsampled daily_stats series, written by maintenance?action=update_stats and read by stats?action=trends|movement.
+-- bucket_days: 1 (daily, with rank), 7 (weeks from Monday), 30 (calendar months).
+-- value_* is activity_count for users and photo_rating for photos.
+CREATE TABLE IF NOT EXISTS stats_rollups (
+    entity_type VARCHAR(5) NOT NULL,
+    bucket_days SMALLINT NOT NULL,
+    entity_id INTEGER NOT NULL,
+    bucket_start DATE NOT NULL,
+    value_last INTEGER NOT NULL,
+    value_max INTEGER NOT NULL,
+    rank_last INTEGER,
+    rank_best INTEGER,
+    PRIMARY KEY (entity_type, bucket_days, entity_id, bucket_start)
+);
+
+CREATE INDEX IF NOT EXISTS idx_stats_rollups_rank ON stats_rollups(entity_type, bucket_days, bucket_start, rank_last);
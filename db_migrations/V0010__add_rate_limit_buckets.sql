@@ -0,0 +1,7 @@
+-- Shared token buckets for RATE_LIMIT_BACKEND=postgres (voting and photos POST).
+-- Unlogged: losing the buckets on a crash only refills everyone, so skip the WAL.
+CREATE UNLOGGED TABLE IF NOT EXISTS rate_limit_buckets (
+    bucket_key VARCHAR(100) PRIMARY KEY,
+    tokens DOUBLE PRECISION NOT NULL,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
@@ -0,0 +1,4 @@
+-- Fuzzy username search for stats?action=search_users: substring (ILIKE) and similarity (%) matches.
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX IF NOT EXISTS idx_users_username_trgm ON users USING GIN (username gin_trgm_ops);
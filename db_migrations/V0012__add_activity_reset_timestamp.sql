@@ -0,0 +1,4 @@
+-- Exact instant of the last activity reset, so reconcile can tell which votes still count towards activity.
+-- Existing rows stay NULL (their reset time is unknown) and are skipped by reconcile until the next reset.
+ALTER TABLE user_activity ADD COLUMN IF NOT EXISTS last_reset_at TIMESTAMPTZ;
+ALTER TABLE user_activity ALTER COLUMN last_reset_at SET DEFAULT now();
@@ -7,6 +7,7 @@ import AuthPage from "./pages/AuthPage";
 import HomePage from "./pages/HomePage";
 import VotePage from "./pages/VotePage";
 import ProfilePage from "./pages/ProfilePage";
+import { clearSession, hasValidSession, setSessionExpiredHandler } from "./lib/api";
 
 const queryClient = new QueryClient();
 
@@ -14,6 +15,7 @@ type Page = 'auth' | 'home' | 'profile' | 'vote';
 
 const App = () => {
   const [currentPage, setCurrentPage] = useState<Page>(() => {
+    if (localStorage.getItem('userId') && !hasValidSession()) clearSession();
     const savedUserId = localStorage.getItem('userId');
     const savedPage = localStorage.getItem('currentPage') as Page | null;
     if (!savedUserId) return 'auth';
@@ -40,6 +42,18 @@ const App = () => {
     }
   }, [currentPage, userId]);
 
+  const handleLogout = () => {
+    clearSession();
+    setUserId(0);
+    setCurrentUser('');
+    setCurrentPage('auth');
+  };
+
+  useEffect(() => {
+    setSessionExpiredHandler(handleLogout);
+    return () => setSessionExpiredHandler(null);
+  }, []);
+
   const handleLogin = (id: number, username: string) => {
     setUserId(id);
     setCurrentUser(username);
@@ -56,7 +70,7 @@ const App = () => {
         <Toaster />
         <Sonner />
         {currentPage === 'auth' && <AuthPage onLogin={handleLogin} />}
-        {currentPage === 'home' && <HomePage currentUser={currentUser} userId={userId} onNavigate={handleNavigate} />}
+        {currentPage === 'home' && <HomePage currentUser={currentUser} userId={userId} onNavigate={handleNavigate} onLogout={handleLogout} />}
         {currentPage === 'vote' && <VotePage userId={userId} onNavigate={handleNavigate} />}
         {currentPage === 'profile' && <ProfilePage currentUser={currentUser} userId={userId} onNavigate={handleNavigate} />}
       </TooltipProvider>
@@ -1,3 +1,5 @@
+import { blurhashToDataUrl } from './blurhash';
+
 const API_URLS = {
   auth: 'https://functions.poehali.dev/ccc2cacc-25ed-4641-9f58-6ee23be6fa7c',
   photos: 'https://functions.poehali.dev/4ccb62b9-d773-45ee-aaeb-261b47fe6c4f',
@@ -8,23 +10,73 @@ const API_URLS = {
   thumbnail: 'https://functions.poehali.dev/7dc9a7ac-9229-433e-8ca9-7627d247a291',
 };
 
+const READ_YOUR_WRITES_MS = 60_000;
+
+let lastWrite: { lsn: string; at: number } | null = null;
+
+function rememberWrite(lsn?: string | null) {
+  if (lsn) lastWrite = { lsn, at: Date.now() };
+}
+
+function withReadLsn(url: string): string {
+  if (!lastWrite || Date.now() - lastWrite.at > READ_YOUR_WRITES_MS) return url;
+  const separator = url.includes('?') ? '&' : '?';
+  return `${url}${separator}min_lsn=${encodeURIComponent(lastWrite.lsn)}`;
+}
+
+const SESSION_TOKEN_KEY = 'sessionToken';
+const SESSION_EXPIRES_KEY = 'sessionExpiresAt';
+
+let onSessionExpired: (() => void) | null = null;
+
+export function setSessionExpiredHandler(handler: (() => void) | null) {
+  onSessionExpired = handler;
+}
+
+export function hasValidSession(): boolean {
+  const token = localStorage.getItem(SESSION_TOKEN_KEY);
+  const expiresAt = Number(localStorage.getItem(SESSION_EXPIRES_KEY));
+  return Boolean(token) && expiresAt * 1000 > Date.now();
+}
+
+export function clearSession() {
+  ['userId', 'username', 'currentPage', SESSION_TOKEN_KEY, SESSION_EXPIRES_KEY].forEach((key) =>
+    localStorage.removeItem(key)
+  );
+}
+
+function sessionHeaders(): Record<string, string> {
+  const token = localStorage.getItem(SESSION_TOKEN_KEY);
+  return token ? { 'X-Session-Token': token } : {};
+}
+
+function checkSession(response: Response) {
+  if (response.status !== 401) return;
+  clearSession();
+  onSessionExpired?.();
+  throw new Error('Сессия истекла, войдите снова');
+}
+
 export interface User {
   user_id: number;
   username: string;
+  token: string;
+  expires_at: number;
 }
 
 export interface Photo {
   id: number;
   image_url?: string;
   thumbnail_url?: string;
+  placeholder?: string | null;
   rating: number;
   category_name: string;
   category_id: number;
 }
 
 export interface PhotoPair {
-  photo1: Photo & { views_count: number };
-  photo2: Photo & { views_count: number };
+  photo1: Photo & { views_count: number; placeholder_url?: string };
+  photo2: Photo & { views_count: number; placeholder_url?: string };
   category: string;
   completed?: boolean;
 }
@@ -39,11 +91,18 @@ export interface TopPhoto {
   id: number;
   image_url: string;
   thumbnail_url?: string;
+  placeholder?: string | null;
   rating: number;
   category_name: string;
   username: string;
 }
 
+export interface UserSearchResult {
+  id: number;
+  username: string;
+  activity: number;
+}
+
 export interface Stats {
   top_users: TopUser[];
   top_photo: TopPhoto | null;
@@ -62,7 +121,7 @@ async function loadThumbnailsBatch(photoIds: number[]): Promise<Record<string, s
   const results = await Promise.all(
     photoIds.map(async (id) => {
       try {
-        const response = await fetch(`${API_URLS.thumbnail}?photo_id=${id}`);
+        const response = await fetch(withReadLsn(`${API_URLS.thumbnail}?photo_id=${id}`));
         if (response.ok) {
           const { thumbnail_url } = await response.json();
           return { id: id.toString(), url: thumbnail_url };
@@ -77,13 +136,42 @@ async function loadThumbnailsBatch(photoIds: number[]): Promise<Record<string, s
   return Object.fromEntries(results.map(r => [r.id, r.url]));
 }
 
+interface GallerySprite {
+  sprite: string;
+  version: string;
+  tiles: Record<string, { x: number; y: number; w: number; h: number }>;
+}
+
+async function loadGallerySprite(userId: number): Promise<Record<string, string>> {
+  const response = await fetch(withReadLsn(`${API_URLS.thumbnail}?user_id=${userId}`));
+  if (!response.ok) throw new Error('Failed to load gallery sprite');
+  const { sprite, tiles }: GallerySprite = await response.json();
+
+  const image = new Image();
+  image.src = sprite;
+  await image.decode();
+
+  const canvas = document.createElement('canvas');
+  const ctx = canvas.getContext('2d');
+  if (!ctx) throw new Error('Canvas context not available');
+
+  return Object.fromEntries(
+    Object.entries(tiles).map(([id, { x, y, w, h }]) => {
+      canvas.width = w;
+      canvas.height = h;
+      ctx.drawImage(image, x, y, w, h, 0, 0, w, h);
+      return [id, canvas.toDataURL('image/jpeg', 0.85)];
+    })
+  );
+}
+
 async function loadImagesBatch(photoIds: number[]): Promise<Record<string, string>> {
   if (photoIds.length === 0) return {};
   
   const results = await Promise.all(
     photoIds.map(async (id) => {
       try {
-        const response = await fetch(`${API_URLS.image}?photo_id=${id}`);
+        const response = await fetch(withReadLsn(`${API_URLS.image}?photo_id=${id}`));
         if (response.ok) {
           const { image_url } = await response.json();
           return { id: id.toString(), url: image_url };
@@ -111,33 +199,46 @@ export const api = {
       throw new Error(error.error || 'Authentication failed');
     }
 
-    return response.json();
+    const user: User = await response.json();
+    localStorage.setItem(SESSION_TOKEN_KEY, user.token);
+    localStorage.setItem(SESSION_EXPIRES_KEY, user.expires_at.toString());
+    return user;
   },
 
-  async getPhotos(userId?: number): Promise<Photo[]> {
+  // With onThumbnails the list resolves right away with blurhash placeholders as thumbnail_url,
+  // and onThumbnails receives the same list again once the real thumbnails are decoded
+  async getPhotos(userId?: number, onThumbnails?: (photos: Photo[]) => void): Promise<Photo[]> {
     const url = userId 
       ? `${API_URLS.photos}?user_id=${userId}`
       : API_URLS.photos;
     
-    const response = await fetch(url);
+    const response = await fetch(withReadLsn(url));
     if (!response.ok) throw new Error('Failed to fetch photos');
     const photos = await response.json();
     
     if (photos.length === 0) return [];
     
     const photoIds = photos.map((p: Photo) => p.id);
-    const thumbnails = await loadThumbnailsBatch(photoIds);
+    const withThumbnails = async () => {
+      const thumbnails = userId
+        ? await loadGallerySprite(userId).catch(() => loadThumbnailsBatch(photoIds))
+        : await loadThumbnailsBatch(photoIds);
+      return photos.map((photo: Photo) => ({
+        ...photo,
+        thumbnail_url: thumbnails[photo.id.toString()] || blurhashToDataUrl(photo.placeholder)
+      }));
+    };
     
-    return photos.map((photo: Photo) => ({
-      ...photo,
-      thumbnail_url: thumbnails[photo.id.toString()] || ''
-    }));
+    if (!onThumbnails) return withThumbnails();
+    
+    withThumbnails().then(onThumbnails).catch((error) => console.error('Failed to load thumbnails:', error));
+    return photos.map((photo: Photo) => ({ ...photo, thumbnail_url: blurhashToDataUrl(photo.placeholder) }));
   },
 
   async uploadPhoto(userId: number, categoryId: number, imageUrl: string, thumbnailUrl: string): Promise<{ photo_id: number }> {
     const response = await fetch(API_URLS.photos, {
       method: 'POST',
-      headers: { 'Content-Type': 'application/json' },
+      headers: { 'Content-Type': 'application/json', ...sessionHeaders() },
       body: JSON.stringify({ 
         user_id: userId, 
         category_id: categoryId, 
@@ -146,45 +247,64 @@ export const api = {
       }),
     });
 
+    checkSession(response);
     if (!response.ok) {
       const error = await response.json();
       throw new Error(error.error || 'Upload failed');
     }
 
-    return response.json();
+    const result = await response.json();
+    rememberWrite(result.lsn);
+    return result;
   },
 
   async deletePhoto(photoId: number): Promise<void> {
     const response = await fetch(`${API_URLS.photos}?photo_id=${photoId}`, {
       method: 'DELETE',
+      headers: sessionHeaders(),
     });
 
+    checkSession(response);
     if (!response.ok) {
       const error = await response.json();
       throw new Error(error.error || 'Delete failed');
     }
+
+    const result = await response.json();
+    rememberWrite(result.lsn);
   },
 
-  async getVotingPair(userId: number): Promise<PhotoPair> {
-    const response = await fetch(`${API_URLS.voting}?user_id=${userId}`);
+  // Same progressive contract as getPhotos: placeholders first, onImages with the full-size pair
+  async getVotingPair(userId: number, onImages?: (pair: PhotoPair) => void): Promise<PhotoPair> {
+    const response = await fetch(withReadLsn(`${API_URLS.voting}?user_id=${userId}`));
     if (!response.ok) throw new Error('Failed to fetch voting pair');
     const pair = await response.json();
     
     if (pair.completed) return pair;
     
-    const images = await loadImagesBatch([pair.photo1.id, pair.photo2.id]);
+    const withImages = async (): Promise<PhotoPair> => {
+      const images = await loadImagesBatch([pair.photo1.id, pair.photo2.id]);
+      return {
+        ...pair,
+        photo1: { ...pair.photo1, image_url: images[pair.photo1.id.toString()] || '' },
+        photo2: { ...pair.photo2, image_url: images[pair.photo2.id.toString()] || '' }
+      };
+    };
+    
+    if (!onImages) return withImages();
     
+    withImages().then(onImages).catch((error) => console.error('Failed to load voting images:', error));
     return {
       ...pair,
-      photo1: { ...pair.photo1, image_url: images[pair.photo1.id.toString()] || '' },
-      photo2: { ...pair.photo2, image_url: images[pair.photo2.id.toString()] || '' }
+      photo1: { ...pair.photo1, image_url: '', placeholder_url: blurhashToDataUrl(pair.photo1.placeholder) },
+      photo2: { ...pair.photo2, image_url: '', placeholder_url: blurhashToDataUrl(pair.photo2.placeholder) }
     };
   },
 
   async submitVote(userId: number, photo1Id: number, photo2Id: number, winnerPhotoId: number): Promise<void> {
     const response = await fetch(API_URLS.voting, {
       method: 'POST',
-      headers: { 'Content-Type': 'application/json' },
+      headers: { 'Content-Type': 'application/json', ...sessionHeaders() },
       body: JSON.stringify({ 
         user_id: userId, 
         photo1_id: photo1Id, 
@@ -193,10 +313,14 @@ export const api = {
       }),
     });
 
+    checkSession(response);
     if (!response.ok) {
       const error = await response.json();
       throw new Error(error.error || 'Vote failed');
     }
+
+    const result = await response.json();
+    rememberWrite(result.lsn);
   },
 
   async getStats(userId?: number): Promise<Stats> {
@@ -204,7 +328,7 @@ export const api = {
       ? `${API_URLS.stats}?user_id=${userId}`
       : API_URLS.stats;
     
-    const response = await fetch(url);
+    const response = await fetch(withReadLsn(url));
     if (!response.ok) throw new Error('Failed to fetch stats');
     const stats = await response.json();
     
@@ -229,6 +353,15 @@ export const api = {
       }))
     };
   },
+
+  async searchUsers(query: string, limit = 10): Promise<UserSearchResult[]> {
+    const response = await fetch(
+      `${API_URLS.stats}?action=search_users&q=${encodeURIComponent(query)}&limit=${limit}`
+    );
+    if (!response.ok) throw new Error('Failed to search users');
+    const result = await response.json();
+    return result.users;
+  },
 };
 
 export async function createThumbnail(file: File): Promise<string> {
@@ -0,0 +1,83 @@
+const BASE83 = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz#$%*+,-.:;=?@[]^_{|}~';
+
+const decoded = new Map<string, string>();
+
+function decode83(text: string): number {
+  let value = 0;
+  for (const char of text) value = value * 83 + BASE83.indexOf(char);
+  return value;
+}
+
+function srgbToLinear(value: number): number {
+  const v = value / 255;
+  return v <= 0.04045 ? v / 12.92 : Math.pow((v + 0.055) / 1.055, 2.4);
+}
+
+function linearToSrgb(value: number): number {
+  const v = Math.max(0, Math.min(1, value));
+  return v <= 0.0031308 ? Math.round(v * 12.92 * 255) : Math.round((1.055 * Math.pow(v, 1 / 2.4) - 0.055) * 255);
+}
+
+function signPow(value: number, exp: number): number {
+  return Math.sign(value) * Math.pow(Math.abs(value), exp);
+}
+
+// Renders a blurhash from the backend into a tiny data URL that the browser scales up as a placeholder
+export function blurhashToDataUrl(hash: string | null | undefined, width = 32, height = 32): string {
+  if (!hash || hash.length < 6) return '';
+  const key = `${hash}:${width}x${height}`;
+  const cached = decoded.get(key);
+  if (cached !== undefined) return cached;
+
+  const sizeFlag = decode83(hash[0]);
+  const xComponents = (sizeFlag % 9) + 1;
+  const yComponents = Math.floor(sizeFlag / 9) + 1;
+  if (hash.length !== 4 + 2 * xComponents * yComponents) return '';
+
+  const maxValue = (decode83(hash[1]) + 1) / 166;
+  const colors: [number, number, number][] = [];
+  const dc = decode83(hash.substring(2, 6));
+  colors.push([srgbToLinear(dc >> 16), srgbToLinear((dc >> 8) & 255), srgbToLinear(dc & 255)]);
+  for (let i = 1; i < xComponents * yComponents; i++) {
+    const ac = decode83(hash.substring(4 + i * 2, 6 + i * 2));
+    colors.push([
+      signPow((Math.floor(ac / (19 * 19)) - 9) / 9, 2) * maxValue,
+      signPow(((Math.floor(ac / 19) % 19) - 9) / 9, 2) * maxValue,
+      signPow(((ac % 19) - 9) / 9, 2) * maxValue,
+    ]);
+  }
+
+  const canvas = document.createElement('canvas');
+  canvas.width = width;
+  canvas.height = height;
+  const ctx = canvas.getContext('2d');
+  if (!ctx) return '';
+  const image = ctx.createImageData(width, height);
+
+  for (let y = 0; y < height; y++) {
+    for (let x = 0; x < width; x++) {
+      let r = 0;
+      let g = 0;
+      let b = 0;
+      for (let j = 0; j < yComponents; j++) {
+        for (let i = 0; i < xComponents; i++) {
+          const basis = Math.cos((Math.PI * x * i) / width) * Math.cos((Math.PI * y * j) / height);
+          const color = colors[i + j * xComponents];
+          r += color[0] * basis;
+          g += color[1] * basis;
+          b += color[2] * basis;
+        }
+      }
+      const offset = 4 * (x + y * width);
+      image.data[offset] = linearToSrgb(r);
+      image.data[offset + 1] = linearToSrgb(g);
+      image.data[offset + 2] = linearToSrgb(b);
+      image.data[offset + 3] = 255;
+    }
+  }
+
+  ctx.putImageData(image, 0, 0);
+  const url = canvas.toDataURL('image/png');
+  decoded.set(key, url);
+  return url;
+}
@@ -9,6 +9,7 @@ interface HomePageProps {
   currentUser: string;
   userId: number;
   onNavigate: (page: 'home' | 'profile' | 'vote') => void;
+  onLogout: () => void;
 }
 
 interface TopUser {
@@ -22,7 +23,7 @@ interface TopPhoto {
   rating: number;
 }
 
-export default function HomePage({ currentUser, userId, onNavigate }: HomePageProps) {
+export default function HomePage({ currentUser, userId, onNavigate, onLogout }: HomePageProps) {
   const [isMobile, setIsMobile] = useState(window.innerWidth < 768);
   const [loading, setLoading] = useState(true);
   const [topUsers, setTopUsers] = useState<TopUser[]>([]);
@@ -181,6 +182,10 @@ export default function HomePage({ currentUser, userId, onNavigate }: HomePagePr
             <Icon name="User" size={20} />
             Личный кабинет
           </Button>
+          <Button onClick={onLogout} variant="outline" size="lg" className="flex items-center gap-2">
+            <Icon name="LogOut" size={20} />
+            Выйти
+          </Button>
         </div>
       </div>
     </div>
@@ -1,9 +1,9 @@
-import { useState, useEffect } from 'react';
+import { useState, useEffect, useRef } from 'react';
 import { Card } from '@/components/ui/card';
 import { Button } from '@/components/ui/button';
 import Icon from '@/components/ui/icon';
 import { Input } from '@/components/ui/input';
-import { api, compressImage, createThumbnail } from '@/lib/api';
+import { api, compressImage, createThumbnail, type Photo } from '@/lib/api';
 import { useToast } from '@/hooks/use-toast';
 
 interface ProfilePageProps {
@@ -40,6 +40,7 @@ export default function ProfilePage({ currentUser, userId, onNavigate }: Profile
   const [categories, setCategories] = useState<Category[]>([]);
   const [loading, setLoading] = useState(true);
   const [uploading, setUploading] = useState(false);
+  const loadIdRef = useRef(0);
   const { toast } = useToast();
 
   useEffect(() => {
@@ -52,22 +53,26 @@ export default function ProfilePage({ currentUser, userId, onNavigate }: Profile
     loadPhotos();
   }, [userId]);
 
+  const groupByCategory = (photos: Photo[]): Category[] =>
+    CATEGORIES.map((name, index) => ({
+      id: index + 1,
+      name,
+      photos: photos.filter(p => p.category_id === index + 1).map(p => ({
+        id: p.id,
+        image_url: p.thumbnail_url || '',
+        rating: p.rating
+      }))
+    }));
+
   const loadPhotos = async () => {
+    const loadId = ++loadIdRef.current;
     setLoading(true);
     try {
-      const photos = await api.getPhotos(userId);
-      
-      const categoriesData = CATEGORIES.map((name, index) => ({
-        id: index + 1,
-        name,
-        photos: photos.filter(p => p.category_id === index + 1).map(p => ({
-          id: p.id,
-          image_url: p.thumbnail_url || '',
-          rating: p.rating
-        }))
-      }));
+      const photos = await api.getPhotos(userId, (loaded) => {
+        if (loadId === loadIdRef.current) setCategories(groupByCategory(loaded));
+      });
 
-      setCategories(categoriesData);
+      setCategories(groupByCategory(photos));
     } catch (error) {
       console.error('Failed to load photos:', error);
       setCategories(CATEGORIES.map((name, index) => ({
@@ -13,6 +13,7 @@ interface VotePageProps {
 interface Photo {
   id: number;
   image_url: string;
+  placeholder_url?: string;
   rating: number;
   views_count: number;
 }
@@ -43,7 +44,7 @@ export default function VotePage({ userId, onNavigate }: VotePageProps) {
   }, []);
 
   useEffect(() => {
-    if (photoPair) {
+    if (photoPair?.photo1.image_url && photoPair.photo2.image_url) {
       sessionStorage.setItem('currentPhotoPair', JSON.stringify(photoPair));
     }
   }, [photoPair]);
@@ -61,6 +62,7 @@ export default function VotePage({ userId, onNavigate }: VotePageProps) {
     if (photoPair) {
       setCanVote(false);
       setTimeLeft(3);
+      if (!photoPair.photo1.image_url || !photoPair.photo2.image_url) return;
       
       const interval = setInterval(() => {
         setTimeLeft(prev => {
@@ -79,7 +81,11 @@ export default function VotePage({ userId, onNavigate }: VotePageProps) {
 
   const loadPhotoPair = async () => {
     try {
-      const pair = await api.getVotingPair(userId);
+      const pair = await api.getVotingPair(userId, (loaded) => {
+        setPhotoPair(prev =>
+          prev && prev.photo1.id === loaded.photo1.id && prev.photo2.id === loaded.photo2.id ? loaded : prev
+        );
+      });
       
       if ('completed' in pair && pair.completed) {
         setVotingComplete(true);
@@ -173,7 +179,7 @@ export default function VotePage({ userId, onNavigate }: VotePageProps) {
           >
             <div className="bg-gray-950 rounded-lg h-full flex items-center justify-center p-2">
               <img
-                src={photoPair.photo1.image_url}
+                src={photoPair.photo1.image_url || photoPair.photo1.placeholder_url}
                 alt="Фото 1"
                 className="max-w-full max-h-full object-contain rounded"
               />
@@ -186,7 +192,7 @@ export default function VotePage({ userId, onNavigate }: VotePageProps) {
           >
             <div className="bg-gray-950 rounded-lg h-full flex items-center justify-center p-2">
               <img
-                src={photoPair.photo2.image_url}
+                src={photoPair.photo2.image_url || photoPair.photo2.placeholder_url}
                 alt="Фото 2"
                 className="max-w-full max-h-full object-contain rounded"
               />
@@ -211,7 +217,7 @@ export default function VotePage({ userId, onNavigate }: VotePageProps) {
           >
             <div className="bg-gray-950 rounded-lg h-full flex items-center justify-center p-20">
               <img
-                src={photoPair.photo1.image_url}
+                src={photoPair.photo1.image_url || photoPair.photo1.placeholder_url}
                 alt="Фото 1"
                 className="max-w-full max-h-full object-contain rounded"
               />
@@ -234,7 +240,7 @@ export default function VotePage({ userId, onNavigate }: VotePageProps) {
           >
             <div className="bg-gray-950 rounded-lg h-full flex items-center justify-center p-20">
               <img
-                src={photoPair.photo2.image_url}
+                src={photoPair.photo2.image_url || photoPair.photo2.placeholder_url}
                 alt="Фото 2"
                 className="max-w-full max-h-full object-contain rounded"
               />